@@ -1,13 +1,45 @@
+from itertools import chain
+
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
-from src.cannonical_lr_parser import CanonicalLRParser
+from src.batch import parse_batch
+from src.build_service import BuildService
+from src.cannonical_lr_parser import ASSOCIATIVITIES, MODES
+from src.compression import MIN_SIZE, choose_encoding, compress
+from src import diagnostics
+from src.grammar_registry import GrammarRegistry
+from src.lexer import lexer_for, parse_text
+from src.parse_driver import (
+    MAX_ERRORS,
+    TRACE_MODES,
+    ParseResult,
+    parse_tokens,
+    parse_with_recovery,
+    trace_steps,
+)
+from src.parse_tree import TREE_FORMATS, parse_tree
+from src.parser_cache import ParserCache, normalize_grammar, normalize_precedence
+from src.parsing_table import decode_action
+from src.push_parser import PushParser
+from src.response_cache import ResponseCache, response_tag
+from src.table_formats import TABLE_FORMATS, comb_table, sparse_header, sparse_rows
+from src.table_store import TableStore
 
 app = Flask(__name__)
-CORS(app)
-
-# Global parser instance and current grammar
-parser = None
-current_grammar = None
+# The frontend is on another origin and reads ETags for conditional requests
+CORS(app, expose_headers=["ETag"])
+
+# Process-wide cache of built parsers, backed by compiled tables on disk
+parser_cache = ParserCache(store=TableStore.from_environment())
+# Builds submitted through /builds run in worker processes and land in parser_cache
+build_service = BuildService(parser_cache)
+# Serialized analysis responses, keyed by their ETag
+response_cache = ResponseCache()
+# How long shared caches may keep a GET analysis response. The URL names a
+# content-hashed grammar_id, so only a change of output format makes one stale.
+ANALYSIS_MAX_AGE = 24 * 60 * 60
+# Grammars registered through /initialize, so later requests can send an id
+grammar_registry = GrammarRegistry()
 
 
 def sets_to_lists(data):
@@ -19,13 +51,221 @@ def sets_to_lists(data):
     return data
 
 
-def initialize_parser_if_needed(grammar):
-    """Initializes the parser if it's not already initialized or if the grammar has changed."""
-    global parser, current_grammar
-    formatted_grammar = [(item[0], item[1]) for item in grammar]
-    if not parser or formatted_grammar != current_grammar:
-        parser = CanonicalLRParser(formatted_grammar)
-        current_grammar = formatted_grammar
+def goto_or_none(target):
+    """Maps the GOTO table's -1 (no transition) to None for JSON output."""
+    return None if target == -1 else target
+
+
+def serialize_state(parser, i):
+    """Returns state i of the canonical collection with its items and transitions."""
+    transitions = parser.transitions[i]
+    return {
+        f"I{i}": {
+            "items": [str(item) for item in parser.canonical_collection[i]],
+            "transitions": {
+                symbol: f"I{transitions[symbol]}"
+                for symbol in parser.non_terminals + parser.terminals
+                if symbol in transitions
+            },
+        }
+    }
+
+
+def serialize_row(table, state, terminals, non_terminals):
+    """Returns one state's ACTION and GOTO entries keyed by symbol."""
+    return {
+        "State": state,
+        **{
+            symbol: decode_action(table.get_action(state, table.terminal_ids[symbol]))
+            for symbol in terminals
+        },
+        **{
+            symbol: goto_or_none(table.get_goto(state, table.non_terminal_ids[symbol]))
+            for symbol in non_terminals
+        },
+    }
+
+
+def ndjson_response(lines):
+    """Streams each object as its own line of JSON while it is being generated."""
+    return app.response_class(
+        (app.json.dumps(line) + "\n" for line in lines),
+        mimetype="application/x-ndjson",
+    )
+
+
+class RequestError(Exception):
+    """A problem with the request body, reported to the client as a 4xx."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def initialize_parser_if_needed(
+    grammar,
+    mode="canonical",
+    precedence=None,
+    grammar_id=None,
+    lazy=False,
+):
+    """Returns the cached parser for a normalized grammar, building it on a cache miss."""
+    return parser_cache.get_or_build(grammar, mode, precedence, grammar_id, lazy)
+
+
+def query_value(value):
+    # Query strings only carry text; read booleans and integers back
+    if value in ("true", "false"):
+        return value == "true"
+    if value.lstrip("-").isdigit() and value == str(int(value)):
+        return int(value)
+    return value
+
+
+def request_values():
+    """Returns the request's parameters: the JSON body, or the query string of a GET."""
+    if request.method == "GET":
+        return {key: query_value(value) for key, value in request.args.items()}
+    return request.json
+
+
+def grammar_from_request():
+    """Returns (grammar_id, grammar, precedence) for the grammar or grammar_id in the request body."""
+    grammar_id = request_values().get("grammar_id")
+    if grammar_id is not None:
+        definition = grammar_registry.get(grammar_id)
+        if definition is None:
+            raise RequestError(
+                "Unknown grammar_id, register the grammar again with /initialize", 404
+            )
+        return grammar_id, *definition
+    if request.method == "GET":
+        raise RequestError("A grammar_id from /initialize is required")
+
+    grammar = request.json.get("grammar", [])
+    if not grammar:
+        raise RequestError("Grammar is required")
+
+    precedence = request.json.get("precedence")
+    if precedence is not None and (
+        not isinstance(precedence, list)
+        or any(
+            not isinstance(level, list) or not level or level[0] not in ASSOCIATIVITIES
+            for level in precedence
+        )
+    ):
+        raise RequestError(
+            "Precedence must be a list of [associativity, terminal, ...] levels "
+            f"with associativity one of {', '.join(ASSOCIATIVITIES)}"
+        )
+
+    grammar = normalize_grammar(grammar)
+    precedence = normalize_precedence(precedence)
+    return grammar_registry.register(grammar, precedence), grammar, precedence
+
+
+def mode_from_request():
+    mode = request_values().get("mode", "canonical")
+    if mode not in MODES:
+        raise RequestError(f"Mode must be one of {', '.join(MODES)}")
+    return mode
+
+
+def stream_from_request():
+    stream = request_values().get("stream", False)
+    if not isinstance(stream, bool):
+        raise RequestError("Stream must be a boolean")
+    return stream
+
+
+def page_from_request():
+    """Returns the validated (offset, limit) over states in the request body."""
+    offset = request_values().get("offset", 0)
+    limit = request_values().get("limit")
+    if not isinstance(offset, int) or offset < 0:
+        raise RequestError("Offset must be a non-negative integer")
+    if limit is not None and (not isinstance(limit, int) or limit < 0):
+        raise RequestError("Limit must be a non-negative integer")
+    return offset, limit
+
+
+def page_range(offset, limit, total):
+    start = min(offset, total)
+    return start, total if limit is None else min(total, start + limit)
+
+
+def parser_from_request(mode=None, lazy=False):
+    """Returns the parser for the grammar (or grammar_id) and mode in the request body."""
+    grammar_id, grammar, precedence = grammar_from_request()
+    if mode is None:
+        mode = mode_from_request()
+    return initialize_parser_if_needed(grammar, mode, precedence, grammar_id, lazy)
+
+
+def analysis_response(endpoint, params, render, stream=False):
+    """Returns render(parser) for the request's grammar and mode, tagged with an ETag.
+
+    These responses depend only on the grammar, mode, endpoint and params,
+    so a matching If-None-Match is answered with 304 before any parser is
+    looked up, and non-streamed bodies are kept in the response cache.
+    A request naming a grammar_id gets its 304 even where the id isn't
+    registered, such as on a fresh instance.
+
+    GET responses are marked cacheable by shared caches, since their URL
+    holds everything they depend on.
+    """
+    mode = mode_from_request()
+    grammar_id = request_values().get("grammar_id")
+    definition = None
+    if grammar_id is None:
+        definition = grammar_from_request()
+        grammar_id = definition[0]
+    tag = response_tag(grammar_id, mode, endpoint, params)
+    if request.if_none_match.contains_weak(tag):
+        response = app.response_class(status=304)
+    else:
+        cached = None if stream else response_cache.get(tag)
+        if cached is not None:
+            response = app.response_class(cached[0], mimetype=cached[1])
+        else:
+            _, grammar, precedence = definition or grammar_from_request()
+            parser = initialize_parser_if_needed(grammar, mode, precedence, grammar_id)
+            response = render(parser)
+            if not stream:
+                response_cache.put(tag, response.get_data(), response.mimetype)
+    # Weak, since the same body may be sent gzip or br encoded
+    response.set_etag(tag, weak=True)
+    if request.method == "GET":
+        response.cache_control.public = True
+        response.cache_control.max_age = ANALYSIS_MAX_AGE
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """Compresses large JSON and text bodies with br or gzip, leaving streams alone."""
+    if (
+        response.is_streamed
+        or response.direct_passthrough
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or (response.content_length or 0) < MIN_SIZE:
+        return response
+    # Cached analysis bodies also keep their compressed forms
+    tag, _ = response.get_etag()
+    cached = response_cache.get(tag, encoding) if tag else None
+    if cached is not None:
+        response.set_data(cached[0])
+    else:
+        response.set_data(compress(response.get_data(), encoding))
+        if tag:
+            response_cache.put(tag, response.get_data(), response.mimetype, encoding)
+    response.headers["Content-Encoding"] = encoding
+    return response
 
 
 @app.route("/")
@@ -38,37 +278,110 @@ def api():
     return jsonify({"message": "Hello, World!", "status": "success"})
 
 
+# Route to inspect the parser cache
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify({**parser_cache.stats(), "responses": response_cache.stats()})
+
+
+# Route to start building a grammar's parser in a worker process
+@app.route("/builds", methods=["POST"])
+def submit_build():
+    try:
+        grammar_id, grammar, precedence = grammar_from_request()
+        job = build_service.submit(grammar_id, grammar, mode_from_request(), precedence)
+        return jsonify(job.to_dict()), 200 if job.future.done() else 202
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Error submitting build: {str(e)}"}), 500
+
+
+# Route to list build jobs
+@app.route("/builds", methods=["GET"])
+def list_builds():
+    return jsonify({"builds": [job.to_dict() for job in build_service.list()]})
+
+
+# Route to check on a build job
+@app.route("/builds/<job_id>", methods=["GET"])
+def get_build(job_id):
+    job = build_service.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown build job"}), 404
+    return jsonify(job.to_dict())
+
+
 # Route to initialize the parser with a given grammar
 @app.route("/initialize", methods=["POST"])
 def initialize_parser():
     try:
-        grammar = request.json.get("grammar", [])
-        if not grammar:
-            return jsonify({"error": "Grammar is required"}), 400
-
-        initialize_parser_if_needed(grammar)
+        grammar_id, grammar, precedence = grammar_from_request()
+        initialize_parser_if_needed(
+            grammar, mode_from_request(), precedence, grammar_id
+        )
         return jsonify(
-            {"message": "Parser initialized successfully", "status": "success"}
+            {
+                "message": "Parser initialized successfully",
+                "status": "success",
+                "grammar_id": grammar_id,
+            }
         )
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         return jsonify({"error": str(e), "status": "error"}), 500
 
 
+# Route to compare the number of states each construction mode produces
+@app.route("/modes", methods=["POST"])
+def get_mode_state_counts():
+    try:
+        result = {}
+        for mode in MODES:
+            parser = parser_from_request(mode)
+            result[mode] = {
+                "states": len(parser.canonical_collection),
+                "conflicts": len(parser.conflicts),
+            }
+        # How many canonical LR(1) states Pager's merging saved
+        result["pager"]["merged_states"] = (
+            result["canonical"]["states"] - result["pager"]["states"]
+        )
+        return jsonify(result)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Error comparing construction modes: {str(e)}"}), 500
+
+
+# Route to report shift/reduce and reduce/reduce conflicts in the parsing table
+@app.route("/conflicts", methods=["POST"])
+def get_conflicts():
+    try:
+        parser = parser_from_request()
+        return jsonify({"count": len(parser.conflicts), "conflicts": parser.conflicts})
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Error fetching conflicts: {str(e)}"}), 500
+
+
 # Route to compute FIRST and FOLLOW sets for the grammar
-@app.route("/first-follow-sets", methods=["POST"])
+@app.route("/first-follow-sets", methods=["GET", "POST"])
 def get_first_follow_sets():
     try:
-        grammar = request.json.get("grammar", [])
-        if not grammar:
-            return jsonify({"error": "Grammar is required"}), 400
 
-        initialize_parser_if_needed(grammar)
+        def render(parser):
+            result = {
+                "FIRST": sets_to_lists(parser.first_sets),
+                "FOLLOW": sets_to_lists(parser.follow_sets),
+            }
+            return jsonify(result)
 
-        result = {
-            "FIRST": sets_to_lists(parser.first_sets),
-            "FOLLOW": sets_to_lists(parser.follow_sets),
-        }
-        return jsonify(result)
+        return analysis_response("first-follow-sets", {}, render)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         return (
             jsonify({"error": f"Error fetching FIRST and FOLLOW sets: {str(e)}"}),
@@ -77,31 +390,28 @@ def get_first_follow_sets():
 
 
 # Route to compute the canonical collection of LR(1) items
-@app.route("/canonical_collection", methods=["POST"])
+@app.route("/canonical_collection", methods=["GET", "POST"])
 def get_canonical_collection_sets():
     try:
-        grammar = request.json.get("grammar", [])
-        if not grammar:
-            return jsonify({"error": "Grammar is required"}), 400
-
-        initialize_parser_if_needed(grammar)
-
-        # Serialize the canonical collection and transitions
-        canonical_collection_serialized = [
-            {
-                f"I{i}": {
-                    "items": [str(item) for item in state],
-                    "transitions": {
-                        symbol: f"I{parser.goto_table[(i, symbol)]}"
-                        for symbol in parser.non_terminals + parser.terminals
-                        if (i, symbol) in parser.goto_table
-                    },
-                }
-            }
-            for i, state in enumerate(parser.canonical_collection)
-        ]
+        stream = stream_from_request()
+        offset, limit = page_from_request()
+
+        def render(parser):
+            state_count = len(parser.canonical_collection)
+            start, stop = page_range(offset, limit, state_count)
+
+            # Serialize the canonical collection and transitions
+            states = (serialize_state(parser, i) for i in range(start, stop))
+            if stream:
+                return ndjson_response(chain([{"state_count": state_count}], states))
+            return jsonify(
+                {"canonical_collection": list(states), "state_count": state_count}
+            )
 
-        return jsonify({"canonical_collection": canonical_collection_serialized})
+        params = {"stream": stream, "offset": offset, "limit": limit}
+        return analysis_response("canonical_collection", params, render, stream)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         return (
             jsonify({"error": f"Error fetching canonical collection sets: {str(e)}"}),
@@ -110,96 +420,306 @@ def get_canonical_collection_sets():
 
 
 # Route to generate parsing tables
-@app.route("/parsing_tables", methods=["POST"])
+@app.route("/parsing_tables", methods=["GET", "POST"])
 def get_parsing_tables():
     try:
-        grammar = request.json.get("grammar", [])
-        if not grammar:
-            return jsonify({"error": "Grammar is required"}), 400
+        stream = stream_from_request()
+        offset, limit = page_from_request()
+        table_format = request_values().get("format", "dense")
+        if table_format not in TABLE_FORMATS:
+            raise RequestError(f"Format must be one of {', '.join(TABLE_FORMATS)}")
+        dedup = request_values().get("dedup", False)
+        if not isinstance(dedup, bool):
+            raise RequestError("Dedup must be a boolean")
+
+        # The packed arrays are shared by all states, so they can't be paged
+        if table_format == "comb" and (stream or offset or limit is not None):
+            raise RequestError("The comb format can't be paged or streamed")
+
+        def render(parser):
+            table = parser.table
+            if table_format == "comb":
+                return jsonify(comb_table(table))
+            start, stop = page_range(offset, limit, table.num_states)
+            if table_format == "sparse":
+                header = sparse_header(table, table.num_states)
+                rows = sparse_rows(table, start, stop, dedup)
+                if stream:
+                    return ndjson_response(chain([header], rows))
+                return jsonify({**header, "rows": list(rows)})
+
+            # Generate headers and rows for parsing tables
+            terminals = list(parser.terminals) + ["$"]
+            non_terminals = [nt for nt in parser.non_terminals if nt != "S'"]
+            headers = ["State"] + terminals + non_terminals
+            rows = (
+                serialize_row(table, state, terminals, non_terminals)
+                for state in range(start, stop)
+            )
+            if stream:
+                header = {"headers": headers, "state_count": table.num_states}
+                return ndjson_response(chain([header], rows))
+            return jsonify(
+                {
+                    "headers": headers,
+                    "rows": list(rows),
+                    "state_count": table.num_states,
+                }
+            )
 
-        initialize_parser_if_needed(grammar)
+        params = {
+            "stream": stream,
+            "offset": offset,
+            "limit": limit,
+            "format": table_format,
+            "dedup": dedup and table_format == "sparse",
+        }
+        return analysis_response("parsing_tables", params, render, stream)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Error fetching parsing tables: {str(e)}"}), 500
 
-        # Generate headers and rows for parsing tables
-        terminals = list(parser.terminals) + ["$"]
-        non_terminals = [nt for nt in parser.non_terminals if nt != "S'"]
 
-        headers = ["State"] + terminals + non_terminals
-        rows = [
-            {
-                "State": state,
-                **{
-                    symbol: parser.action_table.get((state, symbol), None)
-                    for symbol in terminals
-                },
-                **{
-                    symbol: parser.goto_table.get((state, symbol), None)
-                    for symbol in non_terminals
-                },
-            }
-            for state in range(len(parser.canonical_collection))
+# Route to render FIRST/FOLLOW sets, the canonical collection and the parsing
+# tables (and a parse trace if input_string is given) as plain text
+@app.route("/debug/tables", methods=["POST"])
+def get_debug_tables():
+    try:
+        parser = parser_from_request()
+        sections = [
+            diagnostics.grammar_text(parser),
+            diagnostics.first_follow_table(parser),
+            diagnostics.canonical_collection_text(parser),
+            diagnostics.parsing_tables_text(parser),
         ]
-
-        return jsonify({"headers": headers, "rows": rows})
+        input_string = request.json.get("input_string")
+        if input_string is not None:
+            if not isinstance(input_string, str):
+                raise RequestError("Input string must be a valid string")
+            sections.append(diagnostics.parse_trace_text(parser, input_string))
+        return app.response_class("\n\n".join(sections) + "\n", mimetype="text/plain")
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
-        return jsonify({"error": f"Error fetching parsing tables: {str(e)}"}), 500
+        return jsonify({"error": f"Error rendering tables: {str(e)}"}), 500
 
 
 # Route to parse an input string using the grammar
 @app.route("/parse", methods=["POST"])
 def parse_input():
     try:
-        grammar = request.json.get("grammar", [])
         input_string = request.json.get("input_string", "")
-
-        if not grammar:
-            return jsonify({"error": "Grammar is required"}), 400
         if not isinstance(input_string, str):
-            return jsonify({"error": "Input string must be a valid string"}), 400
+            raise RequestError("Input string must be a valid string")
+        trace = request.json.get("trace", "full")
+        if trace not in TRACE_MODES:
+            raise RequestError(f"Trace must be one of {', '.join(TRACE_MODES)}")
+        trace_limit = request.json.get("trace_limit", 50)
+        if not isinstance(trace_limit, int) or trace_limit < 0:
+            raise RequestError("Trace limit must be a non-negative integer")
+        # Builds only the states this input reaches; their numbers are then
+        # discovery order and don't match /parsing_tables
+        lazy = request.json.get("lazy", False)
+        if not isinstance(lazy, bool):
+            raise RequestError("Lazy must be a boolean")
+        stream = stream_from_request()
+        # Tokenize the raw input by the grammar's terminals instead of on spaces,
+        # with token_patterns mapping terminals such as id or num to regexes
+        lex = request.json.get("lex", False)
+        if not isinstance(lex, bool):
+            raise RequestError("Lex must be a boolean")
+        token_patterns = request.json.get("token_patterns")
+        if token_patterns is not None and (
+            not isinstance(token_patterns, dict)
+            or not all(isinstance(p, str) for p in token_patterns.values())
+        ):
+            raise RequestError("Token patterns must map terminals to regexes")
+
+        # Return the derivation tree of an accepted input in this format
+        tree_format = request.json.get("tree")
+        if tree_format is not None and tree_format not in TREE_FORMATS:
+            raise RequestError(f"Tree must be one of {', '.join(TREE_FORMATS)}")
+
+        # Keep going after syntax errors and report up to max_errors of them
+        recover = request.json.get("recover", False)
+        if not isinstance(recover, bool):
+            raise RequestError("Recover must be a boolean")
+        max_errors = request.json.get("max_errors", 10)
+        if not isinstance(max_errors, int) or not 1 <= max_errors <= MAX_ERRORS:
+            raise RequestError(f"Max errors must be between 1 and {MAX_ERRORS}")
+
+        parser = parser_from_request(lazy=lazy)
+
+        tree = None
+        if lex:
+            try:
+                lexer = lexer_for(parser, token_patterns)
+            except ValueError as e:
+                raise RequestError(str(e))
+        if recover:
+            if lex:
+                lexed = list(lexer.tokenize(input_string, recover=True))
+                # Unmatched characters stay in as None, which no ACTION entry
+                # accepts; their text could spell a terminal or "$"
+                tokens = [token.terminal for token in lexed]
+                texts = [t.text for t in lexed]
+            else:
+                tokens = texts = input_string.split()
+            result = parse_with_recovery(parser.table, tokens, max_errors)
+            if tree_format and result.success:
+                _, tree = parse_tree(parser.table, tokens, texts)
+        elif lex:
+            result = parse_text(parser.table, lexer, input_string)
+            tokens = result.tokens
+            if tree_format and result.success:
+                _, tree = parse_tree(parser.table, tokens, result.texts)
+        else:
+            tokens = input_string.split()
+            if tree_format:
+                result, tree = parse_tree(parser.table, tokens)
+            else:
+                result = parse_tokens(parser.table, tokens)
+
+        # Steps are only formatted for the part of the trace that was asked for.
+        # With recovery the trace runs up to the first error.
+        traced = result
+        if recover and result.errors:
+            traced = ParseResult(
+                False, result.error_position, result.steps_before_error
+            )
+        steps = trace_steps(parser.table, tokens, traced, trace, trace_limit)
+        response = {"success": result.success, "step_count": result.steps}
+        if recover:
+            for error in result.errors:
+                error["token"] = (
+                    texts[error["position"]] if error["position"] < len(texts) else "$"
+                )
+                if lex:
+                    error["offset"] = (
+                        lexed[error["position"]].start
+                        if error["position"] < len(lexed)
+                        else len(input_string)
+                    )
+            response["errors"] = result.errors
+            response["completed"] = result.completed
+            if result.errors:
+                response["error"] = (
+                    f"{len(result.errors)} parsing error(s), the first at position "
+                    f"{result.error_position}"
+                )
+        elif not result.success:
+            if lex:
+                response["error"] = result.error_message
+                response["error_offset"] = result.error_offset
+            else:
+                response["error"] = f"Parsing error at position {result.error_position}"
+        if tree is not None:
+            try:
+                response["tree"] = tree.serialize(tree_format)
+            except ValueError as e:
+                raise RequestError(str(e))
+        if stream:
+            # The outcome goes first, then one line per step
+            return ndjson_response(chain([response], steps))
+        response["steps"] = list(steps)
+        return jsonify(response)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Error during parsing: {str(e)}"}), 500
 
-        initialize_parser_if_needed(grammar)
 
-        input_tokens = input_string.split() + ["$"]
-        stack = [(0, "$")]
-        input_pos = 0
-        parse_steps = []
+# Route to parse input a chunk of tokens at a time. Each response carries
+# the parser state, which the client sends back with the next chunk.
+@app.route("/parse/push", methods=["POST"])
+def parse_push():
+    try:
+        tokens = request.json.get("tokens")
+        if tokens is None:
+            input_string = request.json.get("input_string", "")
+            if not isinstance(input_string, str):
+                raise RequestError("Input string must be a valid string")
+            tokens = input_string.split()
+        elif not isinstance(tokens, list) or not all(
+            isinstance(token, str) for token in tokens
+        ):
+            raise RequestError("Tokens must be a list of strings")
+        finish = request.json.get("finish", False)
+        if not isinstance(finish, bool):
+            raise RequestError("Finish must be a boolean")
+
+        grammar_id, grammar, precedence = grammar_from_request()
+        mode = mode_from_request()
+        parser = initialize_parser_if_needed(grammar, mode, precedence, grammar_id)
+
+        state = request.json.get("state")
+        if state is None:
+            push_parser = PushParser(parser.table)
+        else:
+            if not isinstance(state, dict) or (
+                state.get("grammar_id"),
+                state.get("mode"),
+            ) != (grammar_id, mode):
+                raise RequestError("State belongs to a different grammar or mode")
+            try:
+                push_parser = PushParser.restore(parser.table, state)
+            except ValueError as e:
+                raise RequestError(str(e))
+
+        push_parser.feed_many(tokens)
+        response = {}
+        if finish or push_parser.error_position is not None:
+            result = push_parser.finish()
+            response["success"] = result.success
+            response["step_count"] = result.steps
+            if not result.success:
+                response["error"] = f"Parsing error at position {result.error_position}"
+        response["state"] = {
+            "grammar_id": grammar_id,
+            "mode": mode,
+            **push_parser.snapshot(),
+        }
+        return jsonify(response)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Error during parsing: {str(e)}"}), 500
 
-        while True:
-            current_state = stack[-1][0]
-            current_input = input_tokens[input_pos]
 
-            # Fetch action from parsing table
-            action_tuple = parser.action_table.get((current_state, current_input))
-            if not action_tuple:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Parsing error at position {input_pos}",
-                        "steps": parse_steps,
-                    }
-                )
+# Route to parse many input strings with one grammar's compiled tables
+@app.route("/parse/batch", methods=["POST"])
+def parse_batch_inputs():
+    try:
+        inputs = request.json.get("inputs", [])
+        if not isinstance(inputs, list) or not all(isinstance(i, str) for i in inputs):
+            raise RequestError("Inputs must be a list of strings")
+        parallel = request.json.get("parallel")
+        if parallel is not None and not isinstance(parallel, bool):
+            raise RequestError("Parallel must be a boolean")
 
-            action, value = action_tuple
-            parse_steps.append(
-                {
-                    "stack": str(stack),
-                    "input": " ".join(input_tokens[input_pos:]),
-                    "action": f"{action} {value}",
-                }
-            )
+        parser = parser_from_request()
+        results = parse_batch(parser.table, inputs, parallel)
 
-            if action == "shift":
-                stack.append((value, current_input))
-                input_pos += 1
-            elif action == "reduce":
-                production = parser.grammar[value]
-                for _ in range(len(production[1])):
-                    stack.pop()
-                goto_state = parser.goto_table[(stack[-1][0], production[0])]
-                stack.append((goto_state, production[0]))
-            elif action == "accept":
-                return jsonify({"success": True, "steps": parse_steps})
+        accepted = sum(1 for result in results if result.success)
+        return jsonify(
+            {
+                "accepted": accepted,
+                "rejected": len(results) - accepted,
+                "results": [
+                    {
+                        "success": result.success,
+                        "error_position": result.error_position,
+                        "step_count": result.steps,
+                    }
+                    for result in results
+                ],
+            }
+        )
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
-        return jsonify({"error": f"Error during parsing: {str(e)}"}), 500
+        return jsonify({"error": f"Error during batch parsing: {str(e)}"}), 500
 
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from src.parse_driver import ParseResult, parse_tokens
+from src.parsing_table import CompiledTable
+
+# Batches smaller than this are parsed in the request thread
+PARALLEL_THRESHOLD = 2000
+CHUNK_SIZE = 500
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        # A forked child could inherit a lock some request thread was holding
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def parse_chunk(table: CompiledTable, inputs: list[str]) -> list[tuple]:
+    """Parses a chunk of inputs, returning plain tuples that pickle cheaply."""
+    results = []
+    for input_string in inputs:
+        result = parse_tokens(table, input_string.split())
+        results.append((result.success, result.error_position, result.steps))
+    return results
+
+
+def parse_batch(
+    table: CompiledTable, inputs: list[str], parallel: bool | None = None
+) -> list[ParseResult]:
+    """Parses every input with one compiled table.
+
+    With parallel left as None, batches of PARALLEL_THRESHOLD inputs or more
+    are split into chunks and parsed on a process pool. If worker processes
+    can't be used on this platform, the batch is parsed in-process instead.
+    """
+    if parallel is None:
+        parallel = len(inputs) >= PARALLEL_THRESHOLD
+
+    rows = None
+    if parallel and len(inputs) > CHUNK_SIZE:
+        chunks = [inputs[i : i + CHUNK_SIZE] for i in range(0, len(inputs), CHUNK_SIZE)]
+        try:
+            pool = get_pool()
+            futures = [pool.submit(parse_chunk, table, chunk) for chunk in chunks]
+            rows = [row for future in futures for row in future.result()]
+        except (OSError, NotImplementedError, RuntimeError):
+            rows = None
+    if rows is None:
+        rows = parse_chunk(table, inputs)
+
+    return [ParseResult(*row) for row in rows]
@@ -0,0 +1,159 @@
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from src.cannonical_lr_parser import CanonicalLRParser
+from src.parser_cache import ParserCache
+from src.table_store import decode_parser, encode_parser
+
+# Finished jobs are forgotten oldest first beyond this many
+MAX_JOBS = 256
+
+
+def build_tables(
+    grammar: list[tuple[str, list[str]]],
+    mode: str,
+    precedence: list[list[str]] | None,
+) -> bytes:
+    """Runs in a worker process: builds a parser and returns it in the table file format."""
+    return encode_parser(CanonicalLRParser(grammar, mode, precedence), mode)
+
+
+class BuildJob:
+    def __init__(self, job_id: str, grammar_id: str, mode: str, future: Future):
+        self.job_id = job_id
+        self.grammar_id = grammar_id
+        self.mode = mode
+        self.future = future
+        # The worker's own future, while the build is waiting in the pool
+        self.worker: Future | None = None
+        self.submitted_at = time.time()
+        self.finished_at: float | None = None
+        future.add_done_callback(self.finished)
+
+    def finished(self, future: Future):
+        self.finished_at = time.time()
+
+    @property
+    def status(self) -> str:
+        if self.future.done():
+            return "failed" if self.future.exception() else "done"
+        if self.worker is not None and not self.worker.running():
+            return "queued"
+        return "running"
+
+    def to_dict(self) -> dict:
+        result = {
+            "job_id": self.job_id,
+            "grammar_id": self.grammar_id,
+            "mode": self.mode,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+        if result["status"] == "failed":
+            result["error"] = str(self.future.exception())
+        elif result["status"] == "done":
+            result["states"] = self.future.result().table.num_states
+        return result
+
+
+class BuildService:
+    """Builds parsers in worker processes, so big grammars don't hold the GIL.
+
+    Jobs are keyed by grammar id and mode, so resubmitting returns the same
+    job. A worker sends back the parser in the table file format, which is
+    decoded here, written to the parser cache's table store and put in the
+    cache. While a job runs, cache misses for its grammar wait on it rather
+    than starting a second build.
+    """
+
+    def __init__(self, cache: ParserCache, workers: int | None = None):
+        self.cache = cache
+        self.workers = workers
+        self.executor: ProcessPoolExecutor | None = None
+        self.jobs: OrderedDict[str, BuildJob] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def pool(self) -> ProcessPoolExecutor:
+        # Started on first use; spawned rather than forked, since the server
+        # process has threads and locks of its own
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
+
+    def submit(
+        self,
+        grammar_id: str,
+        grammar: list[tuple[str, list[str]]],
+        mode: str = "canonical",
+        precedence: list[list[str]] | None = None,
+    ) -> BuildJob:
+        job_id = f"{grammar_id}-{mode}"
+        key = f"{grammar_id}:{mode}"
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status != "failed":
+                return job
+
+            parser = self.cache.get(key)
+            if parser is not None:
+                future = Future()
+                future.set_result(parser)
+                job = BuildJob(job_id, grammar_id, mode, future)
+            else:
+                future = Future()
+                current = self.cache.add_build(key, future)
+                job = BuildJob(job_id, grammar_id, mode, current)
+                if current is future:
+                    try:
+                        job.worker = self.pool().submit(
+                            build_tables, grammar, mode, precedence
+                        )
+                    except Exception as e:
+                        # e.g. the pool broke; waiters on the cache must not hang
+                        future.set_exception(e)
+                    else:
+                        job.worker.add_done_callback(
+                            lambda worker: self.finish(grammar_id, mode, worker, future)
+                        )
+
+            self.jobs[job_id] = job
+            self.jobs.move_to_end(job_id)
+            self._forget()
+            return job
+
+    def finish(self, grammar_id: str, mode: str, worker: Future, future: Future):
+        error = worker.exception()
+        if error is not None:
+            future.set_exception(error)
+            return
+        data = worker.result()
+        parser = decode_parser(data, mode)
+        if parser is None:
+            future.set_exception(RuntimeError("Build worker returned invalid tables"))
+            return
+        if self.cache.store is not None:
+            self.cache.store.write(grammar_id, mode, data)
+        future.set_result(parser)
+
+    def get(self, job_id: str) -> BuildJob | None:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> list[BuildJob]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def _forget(self):
+        # Called with the lock held; jobs still building are always kept
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= MAX_JOBS:
+                break
+            if self.jobs[job_id].future.done():
+                del self.jobs[job_id]
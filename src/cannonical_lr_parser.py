@@ -1,63 +1,107 @@
-from src.lr_item import LRItem
-from tabulate import tabulate
+import threading
+from collections import deque
+
+from src.digraph import digraph
+from src.lr_item import DOT_BITS, DOT_MASK, LRItem
+from src.parse_driver import parse_tokens
+from src.parsing_table import (
+    ACCEPT,
+    ERROR,
+    CompiledTable,
+    decode_action,
+    encode_reduce,
+    encode_shift,
+)
+from src.symbol_table import SymbolTable
+
+# Supported ways of building the automaton, from largest to smallest
+MODES = ("canonical", "pager", "lalr", "slr")
+# Modes whose states depend only on their kernel, so they can be built lazily
+LAZY_MODES = ("canonical", "slr")
+ASSOCIATIVITIES = ("left", "right", "nonassoc")
 
 
 class CanonicalLRParser:
-    def __init__(self, grammar: list[tuple[str, list[str]]]):
-        self.grammar: list[tuple[str, list[str]]] = grammar
+    def __init__(
+        self,
+        grammar: list[tuple[str, list[str]]],
+        mode: str = "canonical",
+        precedence: list[list[str]] | None = None,
+        lazy: bool = False,
+    ):
+        """Builds the automaton and tables for a grammar.
+
+        A lazy parser starts with only the initial state. Other states and
+        their table rows are built the first time a parse reaches them, and
+        are numbered in the order they are discovered.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown construction mode: {mode}")
+        if lazy and mode not in LAZY_MODES:
+            raise ValueError(f"Mode {mode} can't be built lazily")
+        self.mode = mode
+        self.lazy = lazy
+        # Lexers compiled for this grammar's terminals, see src.lexer.lexer_for
+        self.lexers: dict = {}
+        # yacc-style precedence levels, lowest first: [associativity, *terminals]
+        self.precedence: dict[str, tuple[int, str]] = {}
+        for level, (associativity, *terminals) in enumerate(precedence or []):
+            if associativity not in ASSOCIATIVITIES:
+                raise ValueError(f"Unknown associativity: {associativity}")
+            for terminal in terminals:
+                self.precedence[terminal] = (level, associativity)
+        self.conflicts: list[dict] = []
+        # Copy so that augmenting the grammar doesn't mutate the caller's list
+        self.grammar: list[tuple[str, list[str]]] = [
+            (left, list(right)) for left, right in grammar
+        ]
         self.terminals = []
         self.non_terminals = []
         self.first_sets: dict[str, set] = {}
         self.follow_sets: dict[str, set] = {}
-        self.canonical_collection: list[LRItem] = []
-        self.goto_table = {}
-        self.action_table = {}
-        self.goto_and_action_table = {}
+        self.canonical_collection: list[set[LRItem]] = []
+        self.kernels: list[frozenset[LRItem]] = []
+        self.kernel_index: dict[frozenset[LRItem], int] = {}
+        self.transitions: list[dict[str, int]] = []
+        self.table: CompiledTable | None = None
+        self._goto_table: dict[tuple[int, str], int] | None = None
+        self._action_table: dict[tuple[int, str], tuple[str, int | None]] | None = None
+        self.symbols = SymbolTable()
+        self.nullable: set[str] = set()
+        self.first_bits: dict[str, int] = {}
+        self.follow_bits: dict[str, int] = {}
+        self.productions_by_lhs: dict[str, list[int]] = {}
+        self.first_after_dot: dict[tuple[int, int], tuple[int, bool]] = {}
+        self._closure_cache: dict[tuple[str, int], frozenset[LRItem]] = {}
         self.initialize_grammar()
         self.compute_first_sets()
+        self.compute_first_after_dot()
         self.compute_follow_sets()
 
-        # self.display_grammar()
-        # print(self.get_first_and_follow_sets_table())
+        if self.lazy:
+            self.start_lazy_automaton()
+            return
 
         self.build_canonical_collection()
-
-        self.print_canonical_collection()
-
         self.build_parsing_table()
 
-        self.print_parsing_tables()
-
-    def get_first_sets_table(self):
-        headers = ["Symbol", "First"]
-        data: list[tuple[str, set[str]]] = []
-        for symbol, symbols in self.first_sets.items():
-            data.append((symbol, symbols))
-
-        return tabulate(data, headers=headers, tablefmt="simple_grid")
-
-    def get_follow_sets_table(self):
-        headers = ["Symbol", "Follow"]
-        data: list[tuple[str, set[str]]] = []
-        for symbol, symbols in self.follow_sets.items():
-            data.append((symbol, symbols))
-
-        return tabulate(data, headers=headers, tablefmt="simple_grid")
-
-    def get_first_and_follow_sets_table(self):
-        headers = ["Symbol", "First", "Follow"]
-        data: list[tuple[str, set[str], set[str]]] = []
-        for symbol, symbols in self.first_sets.items():
-            follow_set_val = self.follow_sets.get(
-                symbol, " "
-            )  # use space for non-terminals
-            data.append((symbol, symbols, follow_set_val))
-
-        return tabulate(data, headers=headers, tablefmt="simple_grid")
-
-    def display_grammar(self):
-        for symbol, production in self.grammar:
-            print(f"{symbol} → {''.join(production)}")
+    @property
+    def goto_table(self) -> dict[tuple[int, str], int]:
+        """Transitions of the automaton as a {(state, symbol): state} dict."""
+        if self._goto_table is None:
+            self._goto_table = {
+                (i, symbol): target
+                for i, row in enumerate(self.transitions)
+                for symbol, target in row.items()
+            }
+        return self._goto_table
+
+    @property
+    def action_table(self) -> dict[tuple[int, str], tuple[str, int | None]]:
+        """ACTION table as a {(state, terminal): (action, value)} dict."""
+        if self._action_table is None:
+            self._action_table = self.table.action_dict()
+        return self._action_table
 
     def initialize_grammar(self):
         # Add augmented production S' → S
@@ -76,331 +120,670 @@ class CanonicalLRParser:
                     if symbol not in self.terminals:
                         self.terminals.append(symbol)
 
-    def compute_first_sets(self):
-        # Initialize FIRST sets
-        for symbol in self.non_terminals + self.terminals:
-            self.first_sets[symbol] = set()
-            if symbol in self.terminals:
-                self.first_sets[symbol].add(symbol)
-
-        while True:
-            updated = False
-            for prod in self.grammar:
-                left = prod[0]
-                right = prod[1]
-
-                # For empty productions
-                if not right:
-                    if "ε" not in self.first_sets[left]:
-                        self.first_sets[left].add("ε")
-                        updated = True
-                    continue
-
-                # For each symbol in the right-hand side
-                curr_first = set()
-                all_nullable = True
-
-                for symbol in right:
-                    symbol_first = self.first_sets[symbol].copy()
-                    if "ε" in symbol_first:
-                        symbol_first.remove("ε")
-                        curr_first.update(symbol_first)
-                    else:
-                        curr_first.update(symbol_first)
-                        all_nullable = False
-                        break
-
-                if all_nullable:
-                    curr_first.add("ε")
-
-                if not curr_first.issubset(self.first_sets[left]):
-                    self.first_sets[left].update(curr_first)
-                    updated = True
+        # Intern terminals (with the end marker last) and productions to ids
+        for terminal in self.terminals + ["$"]:
+            self.symbols.intern_terminal(terminal)
+
+        # Index productions by their left side for closure, skipping duplicates
+        for prod_index, prod in enumerate(self.grammar):
+            if self.symbols.add_production(prod) == prod_index:
+                self.productions_by_lhs.setdefault(prod[0], []).append(prod_index)
+
+    def compute_nullable(self):
+        # An explicit "ε" symbol on a right side derives the empty string
+        self.nullable = {"ε"} if "ε" in self.terminals else set()
+
+        # Count the symbols of each production that are not yet known to be nullable
+        remaining = []
+        occurrences: dict[str, list[int]] = {}
+        worklist = []
+        for prod_index, (left, right) in enumerate(self.grammar):
+            count = 0
+            for symbol in right:
+                if symbol not in self.nullable:
+                    count += 1
+                    occurrences.setdefault(symbol, []).append(prod_index)
+            remaining.append(count)
+            if count == 0 and left not in self.nullable:
+                self.nullable.add(left)
+                worklist.append(left)
+
+        while worklist:
+            symbol = worklist.pop()
+            for prod_index in occurrences.get(symbol, []):
+                remaining[prod_index] -= 1
+                left = self.grammar[prod_index][0]
+                if remaining[prod_index] == 0 and left not in self.nullable:
+                    self.nullable.add(left)
+                    worklist.append(left)
 
-            if not updated:
-                break
+    def compute_first_sets(self):
+        self.compute_nullable()
+        index = {symbol: i for i, symbol in enumerate(self.non_terminals)}
+
+        # FIRST(A) starts with the terminals that can begin A directly and
+        # includes FIRST(B) for every B that can begin A
+        edges: list[list[int]] = [[] for _ in self.non_terminals]
+        initial = [0] * len(self.non_terminals)
+        for left, right in self.grammar:
+            for symbol in right:
+                if symbol in index:
+                    edges[index[left]].append(index[symbol])
+                elif symbol != "ε":
+                    initial[index[left]] |= 1 << self.symbols.terminal_ids[symbol]
+                if symbol not in self.nullable:
+                    break
+
+        first_bits = digraph(edges, initial)
+        self.first_bits = {
+            symbol: first_bits[i] for i, symbol in enumerate(self.non_terminals)
+        }
+
+        # Expose FIRST sets by name, with "ε" marking nullable symbols
+        for symbol in self.non_terminals:
+            self.first_sets[symbol] = set(
+                self.symbols.terminal_names(self.first_bits[symbol])
+            )
+            if symbol in self.nullable:
+                self.first_sets[symbol].add("ε")
+        for symbol in self.terminals:
+            self.first_bits[symbol] = (
+                0 if symbol == "ε" else 1 << self.symbols.terminal_ids[symbol]
+            )
+            self.first_sets[symbol] = {symbol}
 
     def compute_follow_sets(self):
-        # Initialize FOLLOW sets
-        for non_terminal in self.non_terminals:
-            self.follow_sets[non_terminal] = set()
-
-        # Add $ to start symbol's FOLLOW set
-        self.follow_sets["S'"].add("$")
-
-        while True:
-            updated = False
-            for prod in self.grammar:
-                left = prod[0]
-                right = prod[1]
-
-                for i, symbol in enumerate(right):
-                    if symbol in self.non_terminals:
-                        # Get everything that can follow this symbol in the production
-                        remaining = right[i + 1 :]
-                        first_of_remaining = set()
-
-                        if remaining:
-                            all_nullable = True
-                            for rem_symbol in remaining:
-                                symbol_first = self.first_sets[rem_symbol].copy()
-                                if "ε" in symbol_first:
-                                    symbol_first.remove("ε")
-                                else:
-                                    all_nullable = False
-                                first_of_remaining.update(symbol_first)
-                                if not all_nullable:
-                                    break
-
-                            # Add computed FIRST set to FOLLOW set
-                            if not first_of_remaining.issubset(
-                                self.follow_sets[symbol]
-                            ):
-                                self.follow_sets[symbol].update(first_of_remaining)
-                                updated = True
-
-                            # If all remaining symbols can derive ε, add FOLLOW(left) to FOLLOW(symbol)
-                            if all_nullable:
-                                if not self.follow_sets[left].issubset(
-                                    self.follow_sets[symbol]
-                                ):
-                                    self.follow_sets[symbol].update(
-                                        self.follow_sets[left]
-                                    )
-                                    updated = True
-                        else:
-                            # If symbol is at the end, add FOLLOW(left) to FOLLOW(symbol)
-                            if not self.follow_sets[left].issubset(
-                                self.follow_sets[symbol]
-                            ):
-                                self.follow_sets[symbol].update(self.follow_sets[left])
-                                updated = True
-
-            if not updated:
-                break
-
-    def compute_first_of_string(self, symbols: list[str]):
-        all_nullable = True
-        first_set: set[str] = set()
-        for symbol in symbols:
-            if symbol == "$":  # for handling look ahead conditions
-                all_nullable = False
-                first_set.update(symbol)
-            elif "ε" in self.first_sets[symbol]:
-                first_set.update(self.first_sets[symbol] - {"ε"})
-            else:
-                all_nullable = False
-                first_set.update(self.first_sets[symbol])
-
-            if not all_nullable:
-                break
-        return first_set
+        index = {symbol: i for i, symbol in enumerate(self.non_terminals)}
+
+        # FOLLOW(B) starts with FIRST(β) for every A → αBβ and includes
+        # FOLLOW(A) whenever β →* ε
+        edges: list[list[int]] = [[] for _ in self.non_terminals]
+        initial = [0] * len(self.non_terminals)
+        initial[index["S'"]] = 1 << self.symbols.terminal_ids["$"]
+        for prod_index, (left, right) in enumerate(self.grammar):
+            for dot_position, symbol in enumerate(right):
+                if symbol in index:
+                    first_beta, nullable = self.first_after_dot[
+                        (prod_index, dot_position + 1)
+                    ]
+                    initial[index[symbol]] |= first_beta
+                    if nullable:
+                        edges[index[symbol]].append(index[left])
+
+        follow_bits = digraph(edges, initial)
+        for i, non_terminal in enumerate(self.non_terminals):
+            self.follow_bits[non_terminal] = follow_bits[i]
+            self.follow_sets[non_terminal] = set(
+                self.symbols.terminal_names(follow_bits[i])
+            )
+
+    def compute_first_after_dot(self):
+        # Precompute FIRST(β) as a terminal bitset, and whether β →* ε,
+        # for every suffix β of every production
+        for prod_index, (_, right) in enumerate(self.grammar):
+            first_beta = 0
+            nullable = True
+            self.first_after_dot[(prod_index, len(right))] = (first_beta, nullable)
+            for dot_position in range(len(right) - 1, -1, -1):
+                symbol = right[dot_position]
+                if symbol in self.nullable:
+                    first_beta |= self.first_bits[symbol]
+                else:
+                    first_beta = self.first_bits[symbol]
+                    nullable = False
+                self.first_after_dot[(prod_index, dot_position)] = (
+                    first_beta,
+                    nullable,
+                )
 
     def closure(self, items: set[LRItem]):
-        closure_set = items.copy()
-
-        while True:
-            new_items = set()
-            for item in closure_set:
-                # If dot is not at the end
-                if item.dot_position < len(item.production[1]):
-                    symbol_after_dot = item.production[1][item.dot_position]
-                    # If symbol after dot is a non-terminal
-                    if symbol_after_dot in self.non_terminals:
-                        # Get the rest of the string after dot
-                        beta = list(item.production[1][item.dot_position + 1 :])
-
-                        # For each production with symbol_after_dot on the left
-                        for prod in self.grammar:
-                            if prod[0] == symbol_after_dot:
-                                # Calculate lookahead for this new item
-                                new_lookahead = set()
-                                # If β is empty, lookahead is the same as the original item
-                                if not beta:
-                                    new_lookahead.update(item.lookahead)
-                                else:
-                                    # Compute FIRST(β)
-                                    first_beta = self.compute_first_of_string(beta)
-                                    # If β →* ε, include the lookahead of the original item
-                                    if "ε" in first_beta:
-                                        new_lookahead.update(item.lookahead)
-                                        first_beta.remove("ε")
-                                    new_lookahead.update(first_beta)
-                                new_item = LRItem((prod[0], prod[1]), 0, new_lookahead)
-                                if new_item not in closure_set:
-                                    new_items.add(new_item)
-
-            if not new_items:
-                break
-
-            closure_set.update(new_items)
-
-        return closure_set
+        closure_set = set(items)
+        productions = self.symbols.productions
 
-    def goto(self, items: set[LRItem], symbol: str):
-        goto_set = set()
         for item in items:
+            prod_index = item.core >> DOT_BITS
+            dot_position = item.core & DOT_MASK
+            right = productions[prod_index][1]
+            # Only items with a non-terminal after the dot add new items
             if (
-                item.dot_position < len(item.production[1])
-                and item.production[1][item.dot_position] == symbol
+                dot_position < len(right)
+                and right[dot_position] in self.productions_by_lhs
             ):
-                new_item = LRItem(
-                    item.production, item.dot_position + 1, item.lookahead
+                # Lookahead is FIRST(β), plus the item's lookahead when β →* ε
+                first_beta, nullable = self.first_after_dot[
+                    (prod_index, dot_position + 1)
+                ]
+                lookahead = first_beta | item.lookahead_bits if nullable else first_beta
+                closure_set.update(
+                    self.expand_non_terminal(right[dot_position], lookahead)
                 )
-                goto_set.add(new_item)
 
-        return self.closure(goto_set) if goto_set else set()
+        return closure_set
+
+    def expand_non_terminal(self, non_terminal: str, lookahead: int):
+        """Returns every item added to a closure by [A → α•Bβ] with the given lookahead."""
+        key = (non_terminal, lookahead)
+        cached = self._closure_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Worklist of (production index, lookahead) for items with the dot at 0
+        seen = {
+            (prod_index, lookahead)
+            for prod_index in self.productions_by_lhs[non_terminal]
+        }
+        worklist = list(seen)
+        while worklist:
+            prod_index, item_lookahead = worklist.pop()
+            right = self.grammar[prod_index][1]
+            if not right or right[0] not in self.productions_by_lhs:
+                continue
+
+            first_beta, nullable = self.first_after_dot[(prod_index, 1)]
+            new_lookahead = first_beta | item_lookahead if nullable else first_beta
+            for next_index in self.productions_by_lhs[right[0]]:
+                entry = (next_index, new_lookahead)
+                if entry not in seen:
+                    seen.add(entry)
+                    worklist.append(entry)
+
+        expanded = frozenset(
+            LRItem.from_core(self.symbols, prod_index << DOT_BITS, item_lookahead)
+            for prod_index, item_lookahead in seen
+        )
+        self._closure_cache[key] = expanded
+        return expanded
 
     def build_canonical_collection(self):
+        if self.mode == "canonical":
+            self.build_lr1_collection()
+        elif self.mode == "pager":
+            self.build_pager_collection()
+        else:
+            self.build_lr0_collection()
+
+    def build_lr1_collection(self):
         # Start with initial item [S' → •S, $]
-        initial_item = LRItem((self.grammar[0][0], self.grammar[0][1]), 0, {"$"})
-        initial_state = self.closure({initial_item})
-
-        self.canonical_collection = [initial_state]
+        initial_item = LRItem.from_core(
+            self.symbols, 0, self.symbols.terminal_bits(["$"])
+        )
+        initial_kernel = frozenset({initial_item})
+
+        # States are identified by their kernel, which determines the closure
+        self.kernels = [initial_kernel]
+        self.kernel_index = {initial_kernel: 0}
+        self.canonical_collection = [self.closure(set(initial_kernel))]
+        self.transitions = [{}]
         symbols = self.non_terminals + self.terminals
+        productions = self.symbols.productions
 
         # Build the collection
         state_index = 0
         while state_index < len(self.canonical_collection):
             current_state = self.canonical_collection[state_index]
 
+            # Advance the dot over each symbol in a single pass over the state
+            goto_kernels: dict[str, set[LRItem]] = {}
+            for item in current_state:
+                right = productions[item.core >> DOT_BITS][1]
+                dot_position = item.core & DOT_MASK
+                if dot_position < len(right):
+                    goto_kernels.setdefault(right[dot_position], set()).add(
+                        item.advanced()
+                    )
+
             for symbol in symbols:
-                goto_set = self.goto(current_state, symbol)
-                if goto_set:
-                    if goto_set not in self.canonical_collection:
-                        self.canonical_collection.append(goto_set)
-                    goto_state_index = self.canonical_collection.index(goto_set)
-                    # if symbol in self.non_terminals:
-                    self.goto_table[(state_index, symbol)] = goto_state_index
-                    # elif symbol in self.terminals:
-                    #     self.action_table[(state_index, symbol)] = goto_state_index
-                    # self.goto_and_action_table[(state_index, symbol)] = goto_state_index
+                if symbol not in goto_kernels:
+                    continue
+                kernel = frozenset(goto_kernels[symbol])
+                goto_state_index = self.kernel_index.get(kernel)
+                if goto_state_index is None:
+                    # Closure is only computed the first time a kernel is seen
+                    goto_state_index = len(self.canonical_collection)
+                    self.kernel_index[kernel] = goto_state_index
+                    self.kernels.append(kernel)
+                    self.canonical_collection.append(self.closure(set(kernel)))
+                    self.transitions.append({})
+                self.transitions[state_index][symbol] = goto_state_index
 
             state_index += 1
 
-    def print_canonical_collection(self):
-        for i, state in enumerate(self.canonical_collection):
-            print(f"\nState I{i}:")
-            for item in state:
-                print(item)
-
-    def print_parsing_tables(self):
-        # Get headers and data for ACTION table
-        terminals = list(self.terminals) + ["$"]
-        action_headers = ["State"] + terminals
-        action_rows = []
-
-        # Get headers and data for GOTO table
-        non_terminals = [nt for nt in self.non_terminals if nt != "S'"]
-
-        goto_headers = non_terminals
-        goto_rows = []
-
-        max_state = len(self.canonical_collection) - 1
-
-        # Build combined rows
-        for state in range(max_state + 1):
-            # Action part
-            action_row = [state]
-            for symbol in terminals:
-                action = self.action_table.get((state, symbol), "")
-                if isinstance(action, tuple):
-                    action_row.append(action)
-                else:
-                    action_row.append(str(action) if action != "" else "")
+    def start_lazy_automaton(self):
+        """Sets up the initial state and a table that grows as states are reached."""
+        self.lock = threading.Lock()
+        self.kernels = []
+        self.kernel_index = {}
+        self.canonical_collection = []
+        self.transitions = []
+        # Kept as states expand, so the parser cache can re-measure cheaply
+        self.item_count = 0
+        self.transition_count = 0
+        self.table = CompiledTable(
+            self.terminals + ["$"], self.non_terminals, self.grammar, 0
+        )
+        self.table.built = bytearray()
+        self.table.expand = self.expand_state
+        self.add_lazy_state(
+            frozenset(
+                {LRItem.from_core(self.symbols, 0, self.lazy_lookahead(0, ["$"]))}
+            )
+        )
+
+    def lazy_lookahead(self, core: int, lookahead: list[str]) -> int:
+        # SLR items always carry FOLLOW of their left side
+        if self.mode == "slr":
+            return self.follow_bits[self.symbols.productions[core >> DOT_BITS][0]]
+        return self.symbols.terminal_bits(lookahead)
+
+    def add_lazy_state(self, kernel: frozenset[LRItem]) -> int:
+        index = self.table.add_state()
+        self.kernel_index[kernel] = index
+        self.kernels.append(kernel)
+        # Closures are only computed once a parse reaches the state
+        self.canonical_collection.append(None)
+        self.transitions.append({})
+        return index
+
+    def expand_state(self, state: int):
+        """Builds the closure, transitions and table row of a reached state."""
+        with self.lock:
+            if self.table.built[state]:
+                return
+            kernel = self.kernels[state]
+            if self.mode == "slr":
+                closure = {
+                    LRItem.from_core(self.symbols, core, self.lazy_lookahead(core, []))
+                    for core in self.lr0_closure(
+                        frozenset(item.core for item in kernel)
+                    )
+                }
+            else:
+                closure = self.closure(set(kernel))
+            self.canonical_collection[state] = closure
+
+            productions = self.symbols.productions
+            goto_kernels: dict[str, set[LRItem]] = {}
+            for item in closure:
+                right = productions[item.core >> DOT_BITS][1]
+                dot_position = item.core & DOT_MASK
+                if dot_position < len(right):
+                    goto_kernels.setdefault(right[dot_position], set()).add(
+                        item.advanced()
+                    )
+            for symbol in self.non_terminals + self.terminals:
+                if symbol in goto_kernels:
+                    kernel = frozenset(goto_kernels[symbol])
+                    target = self.kernel_index.get(kernel)
+                    if target is None:
+                        target = self.add_lazy_state(kernel)
+                    self.transitions[state][symbol] = target
+            self.item_count += len(closure)
+            self.transition_count += len(self.transitions[state])
+
+            self.build_table_row(state)
+            self.table.built[state] = 1
+
+    def build_pager_collection(self):
+        """Builds a minimal LR(1) automaton with Pager's weak compatibility.
+
+        A new kernel is merged into an existing state with the same core
+        when the merge cannot introduce a reduce/reduce conflict that the
+        canonical collection would not have. States whose lookaheads grow
+        are processed again, and states left unreachable are dropped.
+        """
+        productions = self.symbols.productions
+        symbols = self.non_terminals + self.terminals
+        kernels: list[dict[int, int]] = [{0: self.symbols.terminal_bits(["$"])}]
+        states_by_core: dict[frozenset[int], list[int]] = {frozenset({0}): [0]}
+        transitions: list[dict[str, int]] = [{}]
+
+        worklist = deque([0])
+        queued = {0}
+        while worklist:
+            state = worklist.popleft()
+            queued.discard(state)
+            closure = self.merge_lookaheads(
+                self.closure(
+                    {
+                        LRItem.from_core(self.symbols, core, lookahead)
+                        for core, lookahead in kernels[state].items()
+                    }
+                )
+            )
+
+            goto_kernels: dict[str, dict[int, int]] = {}
+            for item in closure:
+                right = productions[item.core >> DOT_BITS][1]
+                dot_position = item.core & DOT_MASK
+                if dot_position < len(right):
+                    kernel = goto_kernels.setdefault(right[dot_position], {})
+                    kernel[item.core + 1] = item.lookahead_bits
+
+            for symbol in symbols:
+                if symbol not in goto_kernels:
+                    continue
+                kernel = goto_kernels[symbol]
+                core = frozenset(kernel)
+                candidates = states_by_core.setdefault(core, [])
+                # Prefer the state this transition already leads to
+                previous = transitions[state].get(symbol)
+                if previous in candidates:
+                    candidates = [previous] + [c for c in candidates if c != previous]
+
+                target = next(
+                    (
+                        candidate
+                        for candidate in candidates
+                        if self.weakly_compatible(kernels[candidate], kernel)
+                    ),
+                    None,
+                )
+                if target is None:
+                    target = len(kernels)
+                    kernels.append(dict(kernel))
+                    transitions.append({})
+                    states_by_core[core].append(target)
+                    worklist.append(target)
+                    queued.add(target)
+                elif kernels[target] != kernel:
+                    grown = False
+                    for kernel_core, lookahead in kernel.items():
+                        if lookahead & ~kernels[target][kernel_core]:
+                            kernels[target][kernel_core] |= lookahead
+                            grown = True
+                    if grown and target not in queued:
+                        worklist.append(target)
+                        queued.add(target)
+                transitions[state][symbol] = target
+
+        # Renumber the states reachable from the start state in visiting order
+        order = [0]
+        renumber = {0: 0}
+        for state in order:
+            for symbol in symbols:
+                target = transitions[state].get(symbol)
+                if target is not None and target not in renumber:
+                    renumber[target] = len(order)
+                    order.append(target)
+
+        self.transitions = [
+            {symbol: renumber[target] for symbol, target in transitions[state].items()}
+            for state in order
+        ]
+        self.kernels = [
+            frozenset(
+                LRItem.from_core(self.symbols, core, lookahead)
+                for core, lookahead in kernels[state].items()
+            )
+            for state in order
+        ]
+        self.kernel_index = {kernel: i for i, kernel in enumerate(self.kernels)}
+        self.canonical_collection = [
+            self.merge_lookaheads(self.closure(set(kernel))) for kernel in self.kernels
+        ]
+
+    @staticmethod
+    def weakly_compatible(first: dict[int, int], second: dict[int, int]) -> bool:
+        """Pager's weak compatibility test for two kernels with the same core."""
+        cores = list(first)
+        for i, core_i in enumerate(cores):
+            for core_j in cores[i + 1 :]:
+                if (
+                    first[core_i] & second[core_j] or second[core_i] & first[core_j]
+                ) and not (
+                    first[core_i] & first[core_j] or second[core_i] & second[core_j]
+                ):
+                    return False
+        return True
+
+    def lr0_closure(self, kernel: frozenset[int]) -> list[int]:
+        """Returns the item cores in the LR(0) closure of a kernel."""
+        productions = self.symbols.productions
+        cores = list(kernel)
+        seen = set(kernel)
+        expanded: set[str] = set()
+        for core in cores:
+            right = productions[core >> DOT_BITS][1]
+            dot_position = core & DOT_MASK
+            if (
+                dot_position < len(right)
+                and right[dot_position] in self.productions_by_lhs
+            ):
+                non_terminal = right[dot_position]
+                if non_terminal in expanded:
+                    continue
+                expanded.add(non_terminal)
+                for prod_index in self.productions_by_lhs[non_terminal]:
+                    new_core = prod_index << DOT_BITS
+                    if new_core not in seen:
+                        seen.add(new_core)
+                        cores.append(new_core)
+        return cores
+
+    def build_lr0_collection(self):
+        productions = self.symbols.productions
+        kernels = [frozenset({0})]
+        kernel_index = {kernels[0]: 0}
+        closures = [self.lr0_closure(kernels[0])]
+        self.transitions = [{}]
+        symbols = self.non_terminals + self.terminals
 
-            # Goto part
-            goto_row = []
-            for symbol in non_terminals:
-                goto_state = self.goto_table.get((state, symbol), "")
-                goto_row.append(goto_state)
+        state_index = 0
+        while state_index < len(kernels):
+            goto_kernels: dict[str, set[int]] = {}
+            for core in closures[state_index]:
+                right = productions[core >> DOT_BITS][1]
+                dot_position = core & DOT_MASK
+                if dot_position < len(right):
+                    goto_kernels.setdefault(right[dot_position], set()).add(core + 1)
 
-            # Combine rows
-            combined_row = action_row + ["||"] + goto_row
-            action_rows.append(combined_row)
+            for symbol in symbols:
+                if symbol not in goto_kernels:
+                    continue
+                kernel = frozenset(goto_kernels[symbol])
+                goto_state_index = kernel_index.get(kernel)
+                if goto_state_index is None:
+                    goto_state_index = len(kernels)
+                    kernel_index[kernel] = goto_state_index
+                    kernels.append(kernel)
+                    closures.append(self.lr0_closure(kernel))
+                    self.transitions.append({})
+                self.transitions[state_index][symbol] = goto_state_index
 
-        # Combine headers
-        combined_headers = action_headers + ["||"] + goto_headers
+            state_index += 1
 
-        print("\nParsing Tables (Action | Goto):")
-        print(tabulate(action_rows, headers=combined_headers, tablefmt="simple_grid"))
+        if self.mode == "lalr":
+            kernel_lookaheads = self.compute_lalr_lookaheads(kernels, closures)
+            self.kernels = [
+                frozenset(
+                    LRItem.from_core(self.symbols, core, kernel_lookaheads[(i, core)])
+                    for core in kernel
+                )
+                for i, kernel in enumerate(kernels)
+            ]
+            # Closure may give one core several lookahead sets; merge them
+            self.canonical_collection = [
+                self.merge_lookaheads(self.closure(set(kernel)))
+                for kernel in self.kernels
+            ]
+        else:
+            # SLR reduces on FOLLOW of the left side, so every item carries it
+            self.canonical_collection = [
+                {
+                    LRItem.from_core(
+                        self.symbols,
+                        core,
+                        self.follow_bits[productions[core >> DOT_BITS][0]],
+                    )
+                    for core in closure
+                }
+                for closure in closures
+            ]
+            self.kernels = [
+                frozenset(item for item in state if item.core in kernel)
+                for state, kernel in zip(self.canonical_collection, kernels)
+            ]
+        self.kernel_index = {kernel: i for i, kernel in enumerate(self.kernels)}
+
+    def compute_lalr_lookaheads(
+        self, kernels: list[frozenset[int]], closures: list[list[int]]
+    ) -> dict[tuple[int, int], int]:
+        """Computes LALR(1) lookaheads of every LR(0) kernel item.
+
+        Closing each kernel item over a dummy lookahead shows which
+        lookaheads it generates spontaneously in successor kernels and
+        which it propagates there (the dummy survives). Propagation is
+        then solved in one pass with the digraph algorithm.
+        """
+        productions = self.symbols.productions
+        dummy = 1 << len(self.symbols.terminals)
+        index: dict[tuple[int, int], int] = {}
+        for state, kernel in enumerate(kernels):
+            for core in kernel:
+                index[(state, core)] = len(index)
+
+        spontaneous = [0] * len(index)
+        propagates_from: list[list[int]] = [[] for _ in index]
+        spontaneous[index[(0, 0)]] = self.symbols.terminal_bits(["$"])
+
+        for (state, core), source in index.items():
+            for item in self.closure({LRItem.from_core(self.symbols, core, dummy)}):
+                right = productions[item.core >> DOT_BITS][1]
+                dot_position = item.core & DOT_MASK
+                if dot_position == len(right):
+                    continue
+                target_state = self.transitions[state][right[dot_position]]
+                target = index[(target_state, item.core + 1)]
+                spontaneous[target] |= item.lookahead_bits & ~dummy
+                if item.lookahead_bits & dummy:
+                    propagates_from[target].append(source)
+
+        lookaheads = digraph(propagates_from, spontaneous)
+        return {key: lookaheads[i] for key, i in index.items()}
+
+    def merge_lookaheads(self, items: set[LRItem]) -> set[LRItem]:
+        """Merges items with the same core into one item per core."""
+        merged: dict[int, int] = {}
+        for item in items:
+            merged[item.core] = merged.get(item.core, 0) | item.lookahead_bits
+        return {
+            LRItem.from_core(self.symbols, core, lookahead)
+            for core, lookahead in merged.items()
+        }
 
     def build_parsing_table(self):
-        for i, state in enumerate(self.canonical_collection):
-            for item in state:
-                # Case 1: Shift action
-                if (
-                    item.dot_position < len(item.production[1])
-                    and item.production[1][item.dot_position] in self.terminals
-                ):
-                    symbol = item.production[1][item.dot_position]
-                    if (i, symbol) in self.goto_table:
-                        self.action_table[(i, symbol)] = (
-                            "shift",
-                            self.goto_table[(i, symbol)],
-                        )
-
-                # Case 2: Reduce action
-                elif item.dot_position == len(item.production[1]):
-                    for lookahead in item.lookahead:
-                        if item.production[0] == "S'":  # Accept
-                            self.action_table[(i, "$")] = ("accept", None)
-                        else:
-                            prod_index = self.grammar.index(item.production)
-                            self.action_table[(i, lookahead)] = ("reduce", prod_index)
+        self.table = CompiledTable(
+            self.terminals + ["$"],
+            self.non_terminals,
+            self.grammar,
+            len(self.canonical_collection),
+        )
+        self.conflicts = []
+        for i in range(len(self.canonical_collection)):
+            self.build_table_row(i)
+
+    def build_table_row(self, i: int):
+        terminal_ids = self.table.terminal_ids
+        non_terminal_ids = self.table.non_terminal_ids
+        transitions = self.transitions[i]
+
+        # Collect every candidate action per terminal before writing any
+        candidates: dict[str, dict[int, list[LRItem]]] = {}
+        state = sorted(
+            self.canonical_collection[i],
+            key=lambda item: (item.core, item.lookahead_bits),
+        )
+        for item in state:
+            right = item.production[1]
+            # Case 1: Shift action
+            if (
+                item.dot_position < len(right)
+                and right[item.dot_position] in terminal_ids
+            ):
+                symbol = right[item.dot_position]
+                if symbol in transitions:
+                    code = encode_shift(transitions[symbol])
+                    candidates.setdefault(symbol, {}).setdefault(code, []).append(item)
+
+            # Case 2: Reduce action (reducing S' → S is accept)
+            elif item.dot_position == len(right):
+                code = ACCEPT if item.prod_id == 0 else encode_reduce(item.prod_id)
+                for lookahead in self.symbols.terminal_names(item.lookahead_bits):
+                    cell = candidates.setdefault(lookahead, {})
+                    cell.setdefault(code, []).append(item)
+
+        for terminal in self.table.terminals:
+            actions = candidates.get(terminal)
+            if not actions:
+                continue
+            if len(actions) == 1:
+                code = next(iter(actions))
+            else:
+                code = self.resolve_conflict(i, terminal, actions)
+            self.table.set_action(i, terminal_ids[terminal], code)
+
+        # GOTO entries for non-terminal transitions
+        for symbol, target in transitions.items():
+            if symbol in non_terminal_ids:
+                self.table.set_goto(i, non_terminal_ids[symbol], target)
+
+    def production_precedence(self, prod_index: int) -> tuple[int, str] | None:
+        # Like yacc, a production takes the precedence of its last terminal
+        for symbol in reversed(self.grammar[prod_index][1]):
+            if symbol in self.precedence:
+                return self.precedence[symbol]
+        return None
+
+    def resolve_conflict(
+        self, state: int, terminal: str, actions: dict[int, list[LRItem]]
+    ) -> int:
+        """Picks one action for a conflicting cell and records the conflict.
+
+        Reduce/reduce conflicts go to the production listed first in the
+        grammar. Shift/reduce conflicts use the precedence and associativity
+        of the terminal and the production when both have one, and otherwise
+        shift, as yacc does. The result never depends on set iteration order.
+        """
+        shifts = [code for code in actions if code > 0]
+        reductions = sorted((code for code in actions if code < 0), reverse=True)
+        chosen = reductions[0] if reductions else shifts[0]
+        resolved_by = "grammar order"
+
+        if shifts and reductions:
+            token_precedence = self.precedence.get(terminal)
+            rule_precedence = self.production_precedence(-chosen - 1)
+            if token_precedence is None or rule_precedence is None:
+                chosen = shifts[0]
+                resolved_by = "default shift"
+            elif token_precedence[0] != rule_precedence[0]:
+                if token_precedence[0] > rule_precedence[0]:
+                    chosen = shifts[0]
+                resolved_by = "precedence"
+            else:
+                associativity = token_precedence[1]
+                if associativity == "right":
+                    chosen = shifts[0]
+                elif associativity == "nonassoc":
+                    chosen = ERROR
+                resolved_by = "associativity"
+
+        ordered = sorted(actions, reverse=True)
+        self.conflicts.append(
+            {
+                "state": state,
+                "lookahead": terminal,
+                "type": "shift/reduce" if shifts else "reduce/reduce",
+                "actions": [decode_action(code) for code in ordered],
+                "items": [str(item) for code in ordered for item in actions[code]],
+                "resolution": decode_action(chosen),
+                "resolved_by": resolved_by,
+            }
+        )
+        return chosen
 
     def parse(self, input_string):
-        # Add end marker to input
-        input_tokens = input_string.split()
-        input_tokens.append("$")
-
-        # Initialize stack with state 0
-        stack = [(0, "$")]
-        input_pos = 0
-
-        # Store parsing steps
-        parse_steps = []
-        headers = ["Stack", "Input", "Action"]
-
-        while True:
-            current_state = stack[-1][0]
-            current_input = input_tokens[input_pos]
-
-            if (current_state, current_input) not in self.action_table:
-                # Format current state
-                stack_str = str(stack)
-                input_str = " ".join(input_tokens[input_pos:])
-                action_str = "error"
-
-                # Store step
-                parse_steps.append([stack_str, input_str, action_str])
-
-                # Print error and table
-                print(f"Parsing error at position {input_pos}")
-                print(tabulate(parse_steps, headers=headers, tablefmt="simple_grid"))
-                return False
-
-            action, value = self.action_table[(current_state, current_input)]
-
-            # Format current state
-            stack_str = str(stack)
-            input_str = " ".join(input_tokens[input_pos:])
-            action_str = f"{action} {value}"
-
-            # Store step
-            parse_steps.append([stack_str, input_str, action_str])
-
-            if action == "shift":
-                stack.append((value, current_input))
-                input_pos += 1
-            elif action == "reduce":
-                production = self.grammar[value]
-                for _ in range(len(production[1])):
-                    stack.pop()
-                prev_state = stack[-1][0]
-                goto_state = self.goto_table[(prev_state, production[0])]
-                stack.append((goto_state, production[0]))
-            elif action == "accept":
-                # Print final table
-                print(tabulate(parse_steps, headers=headers, tablefmt="simple_grid"))
-                return True
+        """Returns whether the space-separated input is in the language.
+
+        Nothing is printed; src.diagnostics renders a trace on request.
+        """
+        return parse_tokens(self.table, input_string.split()).success
@@ -0,0 +1,72 @@
+from src.parse_driver import parse_tokens, trace_steps
+from src.parsing_table import decode_action
+
+# Text renderings of a parser for debugging. Building and parsing never
+# print; these are only called when someone asks to see the tables, so
+# tabulate is imported inside each function rather than on cold start.
+TABLE_FORMAT = "simple_grid"
+
+
+def first_follow_table(parser) -> str:
+    from tabulate import tabulate
+
+    data = [
+        (symbol, symbols, parser.follow_sets.get(symbol, " "))
+        for symbol, symbols in parser.first_sets.items()
+    ]
+    return tabulate(data, headers=["Symbol", "First", "Follow"], tablefmt=TABLE_FORMAT)
+
+
+def grammar_text(parser) -> str:
+    return "\n".join(
+        f"{symbol} → {''.join(production)}" for symbol, production in parser.grammar
+    )
+
+
+def canonical_collection_text(parser) -> str:
+    lines = []
+    for i, state in enumerate(parser.canonical_collection):
+        lines.append(f"\nState I{i}:")
+        lines.extend(str(item) for item in state)
+    return "\n".join(lines)
+
+
+def parsing_tables_text(parser) -> str:
+    """Renders ACTION and GOTO side by side, one row per state."""
+    from tabulate import tabulate
+
+    table = parser.table
+    terminals = list(parser.terminals) + ["$"]
+    non_terminals = [nt for nt in parser.non_terminals if nt != "S'"]
+
+    rows = []
+    for state in range(table.num_states):
+        action_row = [
+            decode_action(table.get_action(state, table.terminal_ids[symbol])) or ""
+            for symbol in terminals
+        ]
+        goto_row = []
+        for symbol in non_terminals:
+            target = table.get_goto(state, table.non_terminal_ids[symbol])
+            goto_row.append("" if target == -1 else target)
+        rows.append([state] + action_row + ["||"] + goto_row)
+
+    headers = ["State"] + terminals + ["||"] + non_terminals
+    return "Parsing Tables (Action | Goto):\n" + tabulate(
+        rows, headers=headers, tablefmt=TABLE_FORMAT
+    )
+
+
+def parse_trace_text(parser, input_string: str, trace="full", limit=50) -> str:
+    from tabulate import tabulate
+
+    tokens = input_string.split()
+    result = parse_tokens(parser.table, tokens)
+    steps = [
+        [step["stack"], step["input"], step["action"]]
+        for step in trace_steps(parser.table, tokens, result, trace, limit)
+    ]
+    text = tabulate(steps, headers=["Stack", "Input", "Action"], tablefmt=TABLE_FORMAT)
+    if not result.success:
+        text = f"Parsing error at position {result.error_position}\n{text}"
+    return text
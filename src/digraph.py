@@ -0,0 +1,49 @@
+def digraph(edges: list[list[int]], initial: list[int]) -> list[int]:
+    """Computes F(x) = initial(x) | F(y) for every y reachable from x.
+
+    Sets are int bitsets. This is DeRemer and Pennello's digraph algorithm:
+    a Tarjan traversal that finishes each strongly connected component after
+    all of the components it depends on, then gives every member of the
+    component the same union. Every edge is followed exactly once.
+    """
+    n = len(edges)
+    result = list(initial)
+    depth = [0] * n
+    finished = n + 1
+    stack: list[int] = []
+
+    for root in range(n):
+        if depth[root]:
+            continue
+        stack.append(root)
+        depth[root] = len(stack)
+        frames = [(root, iter(edges[root]), len(stack))]
+
+        while frames:
+            node, successors, node_depth = frames[-1]
+            for successor in successors:
+                if depth[successor] == 0:
+                    stack.append(successor)
+                    depth[successor] = len(stack)
+                    frames.append((successor, iter(edges[successor]), len(stack)))
+                    break
+                if depth[successor] < depth[node]:
+                    depth[node] = depth[successor]
+                result[node] |= result[successor]
+            else:
+                frames.pop()
+                if depth[node] == node_depth:
+                    # node is the root of a component; all members share its set
+                    while True:
+                        member = stack.pop()
+                        depth[member] = finished
+                        result[member] = result[node]
+                        if member == node:
+                            break
+                if frames:
+                    parent = frames[-1][0]
+                    if depth[node] < depth[parent]:
+                        depth[parent] = depth[node]
+                    result[parent] |= result[node]
+
+    return result
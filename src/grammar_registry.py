@@ -0,0 +1,42 @@
+import threading
+from collections import OrderedDict
+
+from src.parser_cache import grammar_hash
+
+
+class GrammarRegistry:
+    """Maps server-side grammar ids to registered grammar definitions.
+
+    Ids are content hashes, so registering the same grammar twice returns
+    the same id. The least recently used definitions are forgotten first;
+    clients re-register when an id is no longer known.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[
+            str, tuple[list[tuple[str, list[str]]], list[list[str]] | None]
+        ] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def register(
+        self,
+        grammar: list[tuple[str, list[str]]],
+        precedence: list[list[str]] | None = None,
+    ) -> str:
+        grammar_id = grammar_hash(grammar, precedence)
+        with self.lock:
+            self.entries[grammar_id] = (grammar, precedence)
+            self.entries.move_to_end(grammar_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return grammar_id
+
+    def get(
+        self, grammar_id: str
+    ) -> tuple[list[tuple[str, list[str]]], list[list[str]] | None] | None:
+        with self.lock:
+            definition = self.entries.get(grammar_id)
+            if definition is not None:
+                self.entries.move_to_end(grammar_id)
+            return definition
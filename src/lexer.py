@@ -0,0 +1,212 @@
+import json
+import re
+from collections.abc import Iterator
+from typing import NamedTuple
+
+from src.parse_driver import ParseResult
+from src.parsing_table import CompiledTable
+from src.push_parser import PushParser
+
+# Compiled lexers kept per parser; a client cycling through definitions
+# just recompiles
+MAX_LEXERS_PER_PARSER = 8
+
+
+class Token(NamedTuple):
+    terminal: str | None
+    text: str
+    start: int
+
+
+class LexError(ValueError):
+    def __init__(self, text: str, offset: int):
+        super().__init__(f"Unexpected character {text[offset]!r} at offset {offset}")
+        self.offset = offset
+
+
+class Lexer:
+    """Longest-match tokenizer for a grammar's terminals.
+
+    Terminals match their own spelling unless definitions gives them a
+    regex. All literals share one alternation, longest first, so finding
+    the longest literal is a single regex call; each definition is tried
+    after it. On a tie a literal wins (keywords over identifiers), then
+    the earlier definition. Whitespace between tokens is skipped.
+    """
+
+    def __init__(
+        self,
+        terminals: list[str],
+        definitions: dict[str, str] | None = None,
+        skip: str = r"\s+",
+    ):
+        definitions = definitions or {}
+        unknown = [name for name in definitions if name not in terminals]
+        if unknown:
+            raise ValueError(f"Definitions for unknown terminals: {', '.join(unknown)}")
+        try:
+            self.patterns = [
+                (name, re.compile(pattern)) for name, pattern in definitions.items()
+            ]
+        except re.error as e:
+            raise ValueError(f"Invalid token pattern: {e}")
+        literals = sorted(
+            (t for t in terminals if t not in definitions and t),
+            key=len,
+            reverse=True,
+        )
+        self.literals = (
+            re.compile("|".join(re.escape(t) for t in literals)) if literals else None
+        )
+        self.skip = re.compile(skip)
+
+    def tokenize(self, text: str, recover: bool = False) -> Iterator[Token]:
+        """Yields tokens as they are matched; raises LexError on unmatched input.
+
+        With recover, an unmatched character is instead yielded as a token
+        whose terminal is None, and lexing carries on after it.
+        """
+        position = 0
+        end = len(text)
+        while True:
+            skipped = self.skip.match(text, position)
+            if skipped:
+                position = skipped.end()
+            if position >= end:
+                return
+
+            terminal, length = None, 0
+            if self.literals is not None:
+                match = self.literals.match(text, position)
+                if match:
+                    terminal, length = match.group(), match.end() - position
+            for name, pattern in self.patterns:
+                match = pattern.match(text, position)
+                if match and match.end() - position > length:
+                    terminal, length = name, match.end() - position
+            # A zero-length match would never advance
+            if not length:
+                if not recover:
+                    raise LexError(text, position)
+                terminal, length = None, 1
+            yield Token(terminal, text[position : position + length], position)
+            position += length
+
+
+def lexer_for(parser, definitions: dict[str, str] | None = None) -> Lexer:
+    """Returns the parser's lexer for these definitions, compiling it on first use."""
+    key = json.dumps(definitions or {}, sort_keys=True)
+    lexer = parser.lexers.get(key)
+    if lexer is None:
+        lexer = Lexer(parser.terminals, definitions)
+        if len(parser.lexers) >= MAX_LEXERS_PER_PARSER:
+            parser.lexers.clear()
+        parser.lexers[key] = lexer
+    return lexer
+
+
+class TextParseResult(ParseResult):
+    """A ParseResult for raw text, with where in the text parsing stopped."""
+
+    def __init__(
+        self,
+        success: bool,
+        error_position: int | None,
+        steps: int,
+        tokens: list[str | None],
+        texts: list[str],
+        error_offset: int | None = None,
+        error_message: str | None = None,
+    ):
+        super().__init__(success, error_position, steps)
+        self.tokens = tokens
+        self.texts = texts
+        self.error_offset = error_offset
+        self.error_message = error_message
+
+
+def parse_text(table: CompiledTable, lexer: Lexer, text: str) -> TextParseResult:
+    """Lexes and parses in one pass, stopping at the first error of either kind.
+
+    The returned tokens are the terminals read up to the error, so the parse
+    can be replayed for a trace or a tree, and texts are their spellings.
+    An unmatched character is kept as a None token, which no ACTION entry
+    accepts, with the character as its text.
+    """
+    parser = PushParser(table)
+    tokens = []
+    texts = []
+    try:
+        for token in lexer.tokenize(text):
+            tokens.append(token.terminal)
+            texts.append(token.text)
+            if not parser.feed(token.terminal):
+                return TextParseResult(
+                    False,
+                    parser.error_position,
+                    parser.steps,
+                    tokens,
+                    texts,
+                    token.start,
+                    f"Parsing error at position {parser.error_position}, "
+                    f"offset {token.start}: unexpected {token.text!r}",
+                )
+    except LexError as e:
+        tokens.append(None)
+        texts.append(text[e.offset])
+        return TextParseResult(
+            False, parser.position, parser.steps, tokens, texts, e.offset, str(e)
+        )
+
+    result = parser.finish()
+    if result.success:
+        return TextParseResult(True, None, result.steps, tokens, texts)
+    return TextParseResult(
+        False,
+        result.error_position,
+        result.steps,
+        tokens,
+        texts,
+        len(text),
+        f"Parsing error at position {result.error_position}, "
+        "unexpected end of input",
+    )
+
+
+if __name__ == "__main__":
+    from src.cannonical_lr_parser import CanonicalLRParser
+    from src.parse_driver import iter_trace, parse_with_recovery
+
+    parser = CanonicalLRParser(
+        [
+            ("S", ["E"]),
+            ("E", ["E", "+", "T"]),
+            ("E", ["T"]),
+            ("T", ["T", "*", "F"]),
+            ("T", ["F"]),
+            ("F", ["(", "E", ")"]),
+            ("F", ["id"]),
+            ("F", ["num"]),
+        ]
+    )
+    lexer = Lexer(parser.terminals, {"id": "[a-z]+", "num": "[0-9]+"})
+
+    result = parse_text(parser.table, lexer, "ab + 12 * (c)")
+    assert result.success
+    assert result.texts == ["ab", "+", "12", "*", "(", "c", ")"]
+
+    # An unmatched "$" must not read as the end of the input, with or
+    # without recovery, nor in the trace replayed over the tokens
+    result = parse_text(parser.table, lexer, "ab $ 12")
+    assert not result.success and result.error_offset == 3
+    assert result.tokens == ["id", None] and result.texts == ["ab", "$"]
+    assert all(
+        step["action"] != "accept" for step in iter_trace(parser.table, result.tokens)
+    )
+
+    tokens = [token.terminal for token in lexer.tokenize("ab $ 12 ) ) (", recover=True)]
+    assert tokens == ["id", None, "num", ")", ")", "("]
+    recovered = parse_with_recovery(parser.table, tokens)
+    assert not recovered.success and recovered.errors[0]["position"] == 1
+
+    print("Unmatched input is never parsed as a terminal")
@@ -1,38 +1,74 @@
+from src.symbol_table import SymbolTable
+
+# An item's production id and dot position are packed into a single int
+DOT_BITS = 16
+DOT_MASK = (1 << DOT_BITS) - 1
+
+# Shared table for items created outside of a parser
+DEFAULT_SYMBOLS = SymbolTable()
+
+
 class LRItem:
+    __slots__ = ("core", "lookahead_bits", "symbols", "_hash")
+
     def __init__(
         self,
         production: tuple[str, list[str]],
         dot_position: int,
         lookahead: None | set[str] = None,
+        symbols: SymbolTable | None = None,
     ):
-        self.production = tuple(production)  # (left_side, right_side)
-        self.dot_position = dot_position
-        self.lookahead: set[str] = set(lookahead) if lookahead else set()
+        self.symbols = symbols if symbols is not None else DEFAULT_SYMBOLS
+        prod_id = self.symbols.intern_production(production)
+        self.core = (prod_id << DOT_BITS) | dot_position
+        self.lookahead_bits = self.symbols.terminal_bits(lookahead) if lookahead else 0
+        self._hash = hash((self.core, self.lookahead_bits))
+
+    @classmethod
+    def from_core(cls, symbols: SymbolTable, core: int, lookahead_bits: int):
+        item = cls.__new__(cls)
+        item.symbols = symbols
+        item.core = core
+        item.lookahead_bits = lookahead_bits
+        item._hash = hash((core, lookahead_bits))
+        return item
+
+    def advanced(self):
+        """Returns the item with the dot moved one symbol to the right."""
+        return LRItem.from_core(self.symbols, self.core + 1, self.lookahead_bits)
+
+    @property
+    def prod_id(self) -> int:
+        return self.core >> DOT_BITS
+
+    @property
+    def dot_position(self) -> int:
+        return self.core & DOT_MASK
+
+    @property
+    def production(self) -> tuple[str, tuple[str, ...]]:
+        return self.symbols.productions[self.core >> DOT_BITS]
+
+    @property
+    def lookahead(self) -> set[str]:
+        return set(self.symbols.terminal_names(self.lookahead_bits))
 
     def __str__(self):
-        right = list(self.production[1])
+        left, right = self.production
+        right = list(right)
         right.insert(self.dot_position, "•")
-        return f"{self.production[0]} → {' '.join(right)}, {'/'.join(self.lookahead)}"
+        lookahead = self.symbols.terminal_names(self.lookahead_bits)
+        return f"{left} → {' '.join(right)}, {'/'.join(lookahead)}"
 
     def __eq__(self, other):
         return (
-            self.production == other.production
-            and self.dot_position == other.dot_position
-            and self.lookahead == other.lookahead
+            self.core == other.core
+            and self.lookahead_bits == other.lookahead_bits
+            and self.symbols is other.symbols
         )
 
-    @staticmethod
-    def convert_rhs_to_tuple(single_production):
-        return (single_production[0], tuple(single_production[1]))
-
     def __hash__(self):
-        return hash(
-            (
-                self.convert_rhs_to_tuple(self.production),
-                self.dot_position,
-                frozenset(self.lookahead),
-            )
-        )
+        return self._hash
 
 
 if __name__ == "__main__":
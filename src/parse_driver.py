@@ -0,0 +1,254 @@
+from src.parsing_table import CompiledTable, decode_action
+
+# How much of the step log a parse returns
+TRACE_MODES = ("none", "last", "full")
+# Upper bound on the errors one recovering parse reports
+MAX_ERRORS = 100
+# Input the lexer couldn't match is passed as a None token, which maps to
+# no column; this is how one shows in a trace
+UNMATCHED = "<unmatched>"
+
+
+class ParseResult:
+    def __init__(self, success: bool, error_position: int | None, steps: int):
+        self.success = success
+        self.error_position = error_position
+        self.steps = steps
+
+
+def parse_tokens(table: CompiledTable, tokens: list[str]) -> ParseResult:
+    """Runs the LR automaton over the tokens on a stack of state numbers.
+
+    Nothing is formatted while parsing, so the cost is a couple of array
+    lookups per step and the whole parse is linear in the input.
+    """
+    action = table.action
+    goto = table.goto
+    width = len(table.terminals)
+    goto_width = len(table.non_terminals)
+    terminal_ids = table.terminal_ids
+    production_lhs = table.production_lhs
+    production_length = table.production_length
+    end = terminal_ids["$"]
+    built = table.built
+
+    stack = [0]
+    position = 0
+    steps = 0
+    column = terminal_ids.get(tokens[0], -1) if tokens else end
+    while True:
+        # A lazy automaton builds each state's row the first time it is reached
+        if built is not None and not built[stack[-1]]:
+            table.expand(stack[-1])
+        code = action[stack[-1] * width + column] if column >= 0 else 0
+        steps += 1
+        if code > 0:
+            stack.append(code - 1)
+            position += 1
+            column = (
+                terminal_ids.get(tokens[position], -1)
+                if position < len(tokens)
+                else end
+            )
+        elif code < -1:
+            prod_index = -code - 1
+            length = production_length[prod_index]
+            if length:
+                del stack[-length:]
+            stack.append(goto[stack[-1] * goto_width + production_lhs[prod_index]])
+        elif code == -1:
+            return ParseResult(True, None, steps)
+        else:
+            # The failed lookup is not a step
+            return ParseResult(False, position, steps - 1)
+
+
+class RecoveryResult(ParseResult):
+    """A ParseResult that goes on past errors.
+
+    errors lists each error's token position, the token and the terminals
+    the ACTION row would have accepted there. completed says whether the
+    parse reached the end of the input after recovering, and
+    steps_before_error is how far the parse got before the first error.
+    """
+
+    def __init__(
+        self,
+        errors: list[dict],
+        steps: int,
+        steps_before_error: int,
+        completed: bool,
+    ):
+        first = errors[0]["position"] if errors else None
+        super().__init__(not errors and completed, first, steps)
+        self.errors = errors
+        self.steps_before_error = steps_before_error
+        self.completed = completed
+
+
+def expected_terminals(table: CompiledTable, state: int) -> list[str]:
+    """Returns the terminals with an ACTION entry in a state's row."""
+    width = len(table.terminals)
+    row = table.action[state * width : (state + 1) * width]
+    return [table.terminals[column] for column, code in enumerate(row) if code]
+
+
+def recover(
+    table: CompiledTable, stack: list[int], tokens: list[str], position: int
+) -> int | None:
+    """Panic-mode recovery: finds where the parse can resume after an error.
+
+    Looks for the nearest state on the stack with a GOTO on some
+    non-terminal whose target can act on the current token, skipping
+    input tokens until one is found. On success the stack is cut back
+    and the GOTO target pushed, as if that non-terminal had been parsed,
+    and the position to resume at is returned. Returns None when no
+    suffix of the input can be resumed.
+    """
+    width = len(table.terminals)
+    goto_width = len(table.non_terminals)
+    end = table.terminal_ids["$"]
+    for resume in range(position, len(tokens) + 1):
+        column = (
+            table.terminal_ids.get(tokens[resume], -1) if resume < len(tokens) else end
+        )
+        if column < 0:
+            continue
+        for depth in range(len(stack) - 1, -1, -1):
+            row = stack[depth] * goto_width
+            for lhs in range(goto_width):
+                target = table.goto[row + lhs]
+                if target == -1:
+                    continue
+                if table.built is not None and not table.built[target]:
+                    table.expand(target)
+                if table.action[target * width + column]:
+                    del stack[depth + 1 :]
+                    stack.append(target)
+                    return resume
+    return None
+
+
+def parse_with_recovery(
+    table: CompiledTable, tokens: list[str], max_errors: int = 10
+) -> RecoveryResult:
+    """Parses like parse_tokens, but records each error and recovers from it.
+
+    Stops after max_errors errors or when no recovery is possible. If a
+    recovery makes no progress before the next error, at least one more
+    token is skipped, so the parse always moves forward.
+    """
+    stack = [0]
+    position = 0
+    steps = 0
+    errors: list[dict] = []
+    steps_before_error = 0
+    # Where the last recovery resumed, until a token is shifted after it
+    stalled_at = None
+    while True:
+        column = (
+            table.terminal_ids.get(tokens[position], -1)
+            if position < len(tokens)
+            else table.terminal_ids["$"]
+        )
+        if table.built is not None and not table.built[stack[-1]]:
+            table.expand(stack[-1])
+        code = table.get_action(stack[-1], column) if column >= 0 else 0
+        if code > 0:
+            stack.append(code - 1)
+            position += 1
+            stalled_at = None
+        elif code < -1:
+            prod_index = -code - 1
+            length = table.production_length[prod_index]
+            if length:
+                del stack[-length:]
+            lhs = table.production_lhs[prod_index]
+            stack.append(table.get_goto(stack[-1], lhs))
+        elif code == -1:
+            return RecoveryResult(errors, steps + 1, steps_before_error, True)
+        else:
+            if not errors:
+                steps_before_error = steps
+            if stalled_at != position:
+                errors.append(
+                    {
+                        "position": position,
+                        "token": tokens[position] if position < len(tokens) else "$",
+                        "expected": expected_terminals(table, stack[-1]),
+                    }
+                )
+                if len(errors) >= max_errors:
+                    return RecoveryResult(errors, steps, steps_before_error, False)
+                resume = recover(table, stack, tokens, position)
+            else:
+                resume = recover(table, stack, tokens, position + 1)
+            if resume is None:
+                return RecoveryResult(errors, steps, steps_before_error, False)
+            position = resume
+            stalled_at = position
+            continue
+        steps += 1
+
+
+def iter_trace(table: CompiledTable, tokens: list[str], start: int = 0):
+    """Replays a parse, yielding the formatted steps from index start onwards.
+
+    Steps are produced one at a time, and steps before start are replayed
+    without being formatted.
+    """
+    input_tokens = tokens + ["$"]
+    shown = [UNMATCHED if token is None else token for token in input_tokens]
+    stack = [0]
+    # repr of each (state, symbol) pair, so the stack prints like a list of tuples
+    pieces = [repr((0, "$"))]
+    position = 0
+    step = 0
+    while True:
+        current_input = input_tokens[position]
+        column = table.terminal_ids.get(current_input)
+        if table.built is not None and not table.built[stack[-1]]:
+            table.expand(stack[-1])
+        code = table.get_action(stack[-1], column) if column is not None else 0
+        action_tuple = decode_action(code)
+        if not action_tuple:
+            return
+
+        action, value = action_tuple
+        if step >= start:
+            yield {
+                "stack": f"[{', '.join(pieces)}]",
+                "input": " ".join(shown[position:]),
+                "action": f"{action} {value}",
+            }
+        step += 1
+
+        if action == "shift":
+            stack.append(value)
+            pieces.append(repr((value, current_input)))
+            position += 1
+        elif action == "reduce":
+            length = table.production_length[value]
+            if length:
+                del stack[-length:]
+                del pieces[-length:]
+            lhs = table.production_lhs[value]
+            goto_state = table.get_goto(stack[-1], lhs)
+            stack.append(goto_state)
+            pieces.append(repr((goto_state, table.non_terminals[lhs])))
+        elif action == "accept":
+            return
+
+
+def trace_steps(
+    table: CompiledTable,
+    tokens: list[str],
+    result: ParseResult,
+    trace: str = "full",
+    limit: int = 50,
+):
+    """Returns the steps requested by trace: none, the last limit steps, or all."""
+    if trace == "none":
+        return iter(())
+    start = max(0, result.steps - limit) if trace == "last" else 0
+    return iter_trace(table, tokens, start)
@@ -0,0 +1,200 @@
+from array import array
+
+from src.parse_driver import ParseResult
+from src.parsing_table import CompiledTable
+
+# How a tree is returned: nested {"symbol", "children"} objects, nested
+# [symbol, *children] arrays, or the node arrays themselves
+TREE_FORMATS = ("json", "compact", "arena")
+
+# The JSON encoder recurses once per level, so deeper trees only go out
+# in the flat arena format
+MAX_NESTED_DEPTH = 400
+
+
+class ParseTree:
+    """A derivation tree stored as parallel arrays indexed by node id.
+
+    Symbols index names (the terminals, then the non-terminals). Leaves
+    span one token and inner nodes span their children's tokens, as a
+    [start, end) range. Children are created before their parent, so node
+    ids are a post-order and the root is the last node.
+    """
+
+    def __init__(self, names: list[str], terminal_count: int, tokens: list[str]):
+        self.names = names
+        self.terminal_count = terminal_count
+        self.tokens = tokens
+        self.symbol = array("i")
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.start = array("i")
+        self.end = array("i")
+
+    def __len__(self) -> int:
+        return len(self.symbol)
+
+    @property
+    def root(self) -> int:
+        return len(self.symbol) - 1
+
+    def children(self, node: int) -> list[int]:
+        result = []
+        child = self.first_child[node]
+        while child != -1:
+            result.append(child)
+            child = self.next_sibling[child]
+        return result
+
+    def height(self) -> int:
+        heights = array("i", [0]) * len(self)
+        for node in range(len(self)):
+            parent = self.parent[node]
+            if parent != -1 and heights[node] + 1 > heights[parent]:
+                heights[parent] = heights[node] + 1
+        return heights[self.root] if len(self) else 0
+
+    def to_nested(self, compact: bool = False):
+        """Builds nested objects (or [symbol, *children] arrays) bottom-up.
+
+        Leaves are {"symbol", "text", "span"} objects, or just their text
+        when compact. Works without recursion, since children come first.
+        """
+        if self.height() > MAX_NESTED_DEPTH:
+            raise ValueError(
+                f"Tree is deeper than {MAX_NESTED_DEPTH} levels, use the arena format"
+            )
+        built = [None] * len(self)
+        for node in range(len(self)):
+            name = self.names[self.symbol[node]]
+            kids = self.children(node)
+            children = [built[child] for child in kids]
+            # Drop references as we go, so only the unfinished frontier is held
+            for child in kids:
+                built[child] = None
+            leaf = self.symbol[node] < self.terminal_count
+            if compact:
+                built[node] = (
+                    self.tokens[self.start[node]] if leaf else [name, *children]
+                )
+            elif leaf:
+                built[node] = {
+                    "symbol": name,
+                    "text": self.tokens[self.start[node]],
+                    "span": [self.start[node], self.end[node]],
+                }
+            else:
+                built[node] = {
+                    "symbol": name,
+                    "span": [self.start[node], self.end[node]],
+                    "children": children,
+                }
+        return built[self.root] if len(self) else None
+
+    def to_arena(self) -> dict:
+        return {
+            "names": self.names,
+            "terminal_count": self.terminal_count,
+            "root": self.root,
+            "symbol": self.symbol.tolist(),
+            "parent": self.parent.tolist(),
+            "first_child": self.first_child.tolist(),
+            "next_sibling": self.next_sibling.tolist(),
+            "start": self.start.tolist(),
+            "end": self.end.tolist(),
+        }
+
+    def serialize(self, tree_format: str):
+        if tree_format == "arena":
+            return self.to_arena()
+        return self.to_nested(compact=tree_format == "compact")
+
+
+def parse_tree(
+    table: CompiledTable, tokens: list[str], texts: list[str] | None = None
+) -> tuple[ParseResult, ParseTree | None]:
+    """Parses like parse_tokens while building the derivation tree.
+
+    A stack of node ids runs alongside the state stack: a shift adds a leaf
+    and a reduce adds a node over the popped ones. texts, if given, are the
+    source spellings of the tokens for the leaves. The tree is None when
+    the input is rejected.
+    """
+    action = table.action
+    goto = table.goto
+    width = len(table.terminals)
+    goto_width = len(table.non_terminals)
+    terminal_ids = table.terminal_ids
+    production_lhs = table.production_lhs
+    production_length = table.production_length
+    end = terminal_ids["$"]
+    built = table.built
+
+    tree = ParseTree(table.terminals + table.non_terminals, width, texts or tokens)
+    # Nodes are appended to the arrays directly; this loop runs once per node
+    symbol = tree.symbol.append
+    parent = tree.parent
+    first_child = tree.first_child
+    next_sibling = tree.next_sibling
+    starts = tree.start
+    ends = tree.end
+    stack = [0]
+    nodes: list[int] = []
+    node = -1
+    position = 0
+    steps = 0
+    column = terminal_ids.get(tokens[0], -1) if tokens else end
+    while True:
+        if built is not None and not built[stack[-1]]:
+            table.expand(stack[-1])
+        code = action[stack[-1] * width + column] if column >= 0 else 0
+        steps += 1
+        if code > 0:
+            stack.append(code - 1)
+            node += 1
+            symbol(column)
+            parent.append(-1)
+            first_child.append(-1)
+            next_sibling.append(-1)
+            starts.append(position)
+            ends.append(position + 1)
+            nodes.append(node)
+            position += 1
+            column = (
+                terminal_ids.get(tokens[position], -1)
+                if position < len(tokens)
+                else end
+            )
+        elif code < -1:
+            prod_index = -code - 1
+            length = production_length[prod_index]
+            lhs = production_lhs[prod_index]
+            node += 1
+            symbol(width + lhs)
+            parent.append(-1)
+            next_sibling.append(-1)
+            if length:
+                children = nodes[-length:]
+                del stack[-length:]
+                del nodes[-length:]
+                previous = -1
+                for child in children:
+                    parent[child] = node
+                    if previous != -1:
+                        next_sibling[previous] = child
+                    previous = child
+                first_child.append(children[0])
+                starts.append(starts[children[0]])
+                ends.append(ends[children[-1]])
+            else:
+                first_child.append(-1)
+                starts.append(position)
+                ends.append(position)
+            nodes.append(node)
+            stack.append(goto[stack[-1] * goto_width + lhs])
+        elif code == -1:
+            # Accepting reduces by S' → S, whose node would only wrap the root
+            return ParseResult(True, None, steps), tree
+        else:
+            return ParseResult(False, position, steps - 1), None
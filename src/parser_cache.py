@@ -0,0 +1,253 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src.cannonical_lr_parser import LAZY_MODES, CanonicalLRParser
+from src.table_store import StoredParser, TableStore
+
+# Rough per-object costs used to bound the cache by memory instead of by count
+ITEM_BYTES = 400
+TABLE_ENTRY_BYTES = 160
+
+
+def normalize_grammar(grammar) -> list[tuple[str, list[str]]]:
+    """Converts a JSON grammar into the (lhs, rhs) form used by the parser."""
+    return [(str(item[0]), [str(symbol) for symbol in item[1]]) for item in grammar]
+
+
+def normalize_precedence(precedence) -> list[list[str]] | None:
+    """Converts JSON precedence levels into lists of strings."""
+    if not precedence:
+        return None
+    return [[str(entry) for entry in level] for level in precedence]
+
+
+def grammar_hash(
+    grammar: list[tuple[str, list[str]]], precedence: list[list[str]] | None = None
+) -> str:
+    """Returns a canonical content hash of a normalized grammar and its precedence."""
+    payload = json.dumps(
+        [grammar, precedence or []], ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_parser_size(parser: CanonicalLRParser | StoredParser) -> int:
+    """Approximates the memory held by a built parser."""
+    if isinstance(parser, StoredParser) or parser.lazy:
+        # Stored parsers are counted as if loaded; lazy parsers keep running
+        # counts of the states a parse has reached
+        items, transitions = parser.item_count, parser.transition_count
+    else:
+        items = sum(len(state) for state in parser.canonical_collection)
+        transitions = sum(len(row) for row in parser.transitions)
+    table = parser.table
+    table_bytes = table.action.itemsize * (len(table.action) + len(table.goto))
+    return items * ITEM_BYTES + transitions * TABLE_ENTRY_BYTES + table_bytes
+
+
+class ParserCache:
+    """Thread-safe LRU cache of built parsers keyed by grammar hash and mode.
+
+    With a table store, misses are first looked up on disk and newly built
+    parsers are written there, so they survive restarts and cold starts.
+
+    Builds are single-flight: concurrent misses for the same key wait on the
+    one build in progress. Builds run on a bounded pool, so a burst of new
+    grammars can't occupy every request thread.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 64,
+        max_bytes: int = 256 * 1024 * 1024,
+        store: TableStore | None = None,
+        build_workers: int = 2,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, tuple[CanonicalLRParser | StoredParser, int]] = (
+            OrderedDict()
+        )
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.store = store
+        self.store_hits = 0
+        self.coalesced = 0
+        self.building: dict[str, Future] = {}
+        self.builder = ThreadPoolExecutor(
+            max_workers=build_workers, thread_name_prefix="parser-build"
+        )
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> CanonicalLRParser | StoredParser | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self._remeasure(key)
+            return entry[0]
+
+    def put(self, key: str, parser: CanonicalLRParser | StoredParser):
+        size = estimate_parser_size(parser)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self.entries[key] = (parser, size)
+            self.total_bytes += size
+            self._evict()
+
+    def get_or_build(
+        self,
+        grammar: list[tuple[str, list[str]]],
+        mode: str = "canonical",
+        precedence: list[list[str]] | None = None,
+        grammar_id: str | None = None,
+        lazy: bool = False,
+    ) -> CanonicalLRParser | StoredParser:
+        """Returns the parser for a grammar and mode, building it on a miss.
+
+        With lazy set, a parser that builds its states on demand is returned
+        unless a fully built one is already cached. Lazy parsers are cached
+        separately because their states are numbered differently.
+        """
+        if grammar_id is None:
+            grammar_id = grammar_hash(grammar, precedence)
+        key = f"{grammar_id}:{mode}"
+        lazy = lazy and mode in LAZY_MODES
+        if lazy:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+            key = f"{key}:lazy"
+        parser = self.get(key)
+        if parser is not None:
+            return parser
+
+        with self.lock:
+            # Another request may have finished building since the miss above
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry[0]
+            future = self.building.get(key)
+            if future is None:
+                future = self.builder.submit(
+                    self._load_or_build,
+                    key,
+                    grammar_id,
+                    grammar,
+                    mode,
+                    precedence,
+                    lazy,
+                )
+                self.building[key] = future
+            else:
+                self.coalesced += 1
+        return future.result()
+
+    def add_build(self, key: str, future: Future) -> Future:
+        """Registers a build running elsewhere, so misses for key wait on it.
+
+        The future must resolve to a parser, which is cached when it does.
+        If key is already being built, that build's future is returned
+        instead and the new one is left unregistered.
+        """
+        with self.lock:
+            current = self.building.get(key)
+            if current is not None:
+                return current
+            self.building[key] = future
+
+        def finished(future: Future):
+            # Cached before the building entry goes, so no miss slips in between
+            if future.exception() is None:
+                self.put(key, future.result())
+            with self.lock:
+                if self.building.get(key) is future:
+                    del self.building[key]
+
+        future.add_done_callback(finished)
+        return future
+
+    def _load_or_build(
+        self,
+        key: str,
+        grammar_id: str,
+        grammar: list[tuple[str, list[str]]],
+        mode: str,
+        precedence: list[list[str]] | None,
+        lazy: bool = False,
+    ) -> CanonicalLRParser | StoredParser:
+        try:
+            parser = self.store.load(grammar_id, mode) if self.store else None
+            if parser is not None:
+                with self.lock:
+                    self.store_hits += 1
+            else:
+                parser = CanonicalLRParser(grammar, mode, precedence, lazy)
+                # The store only holds complete parsers
+                if self.store and not lazy:
+                    self.store.save(grammar_id, mode, parser)
+            self.put(key, parser)
+            return parser
+        finally:
+            # Waiters hold the future, so a failed build is retried by the next miss
+            with self.lock:
+                self.building.pop(key, None)
+
+    def _remeasure(self, key: str):
+        # Called with the lock held. A lazy parser grows as parses reach new
+        # states, so its size is taken again whenever it is handed out
+        parser, size = self.entries[key]
+        if not isinstance(parser, CanonicalLRParser) or not parser.lazy:
+            return
+        current = estimate_parser_size(parser)
+        if current != size:
+            self.entries[key] = (parser, current)
+            self.total_bytes += current - size
+            self._evict()
+
+    def _evict(self):
+        # Always keep the most recently inserted parser, even if it is oversized
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            for key in list(self.entries):
+                if key in self.entries:
+                    self._remeasure(key)
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "store_hits": self.store_hits,
+                "coalesced": self.coalesced,
+                "building": len(self.building),
+                "store": self.store.directory if self.store else None,
+                "store_evictions": self.store.evictions if self.store else 0,
+            }
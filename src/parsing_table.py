@@ -0,0 +1,288 @@
+from array import array
+from collections import Counter
+from collections.abc import Callable
+
+# ACTION cells are encoded as ints: 0 is an error, shift to state s is s + 1
+# and reduce by production p is -(p + 1). Production 0 is the augmented
+# S' → S, so reducing by it is the accept action.
+ERROR = 0
+ACCEPT = -1
+
+
+def encode_shift(state: int) -> int:
+    return state + 1
+
+
+def encode_reduce(prod_index: int) -> int:
+    return -(prod_index + 1)
+
+
+def decode_action(code: int) -> tuple[str, int | None] | None:
+    """Converts an encoded ACTION cell back to the ("shift", state) form."""
+    if code > 0:
+        return ("shift", code - 1)
+    if code == ACCEPT:
+        return ("accept", None)
+    if code < 0:
+        return ("reduce", -code - 1)
+    return None
+
+
+class CompiledTable:
+    """ACTION/GOTO tables stored as flat, row-major int arrays.
+
+    Terminals (with "$" last) and non-terminals are mapped to integer
+    columns, so a lookup is a single array index.
+    """
+
+    def __init__(
+        self,
+        terminals: list[str],
+        non_terminals: list[str],
+        grammar: list[tuple[str, list[str]]],
+        num_states: int,
+    ):
+        self.terminals = terminals
+        self.terminal_ids = {terminal: i for i, terminal in enumerate(terminals)}
+        self.non_terminals = non_terminals
+        self.non_terminal_ids = {symbol: i for i, symbol in enumerate(non_terminals)}
+        self.num_states = num_states
+        self.action = array("i", [ERROR]) * (num_states * len(terminals))
+        self.goto = array("i", [-1]) * (num_states * len(non_terminals))
+
+        # What a reduce needs: the left side's GOTO column and how much to pop
+        self.production_lhs = array(
+            "i", [self.non_terminal_ids[left] for left, _ in grammar]
+        )
+        self.production_length = array("i", [len(right) for _, right in grammar])
+        # For a lazily built automaton: which rows are filled in, and the
+        # callback that fills in a state's row before it is first used
+        self.built: bytearray | None = None
+        self.expand: Callable[[int], None] | None = None
+
+    @classmethod
+    def from_arrays(
+        cls,
+        terminals: list[str],
+        non_terminals: list[str],
+        num_states: int,
+        action: array,
+        goto: array,
+        production_lhs: array,
+        production_length: array,
+    ) -> "CompiledTable":
+        """Wraps already encoded arrays, e.g. ones read back from a table store."""
+        table = cls.__new__(cls)
+        table.terminals = terminals
+        table.terminal_ids = {terminal: i for i, terminal in enumerate(terminals)}
+        table.non_terminals = non_terminals
+        table.non_terminal_ids = {symbol: i for i, symbol in enumerate(non_terminals)}
+        table.num_states = num_states
+        table.action = action
+        table.goto = goto
+        table.production_lhs = production_lhs
+        table.production_length = production_length
+        table.built = None
+        table.expand = None
+        return table
+
+    def add_state(self) -> int:
+        """Appends an empty row, for automata that grow as they are explored."""
+        self.action.extend(array("i", [ERROR]) * len(self.terminals))
+        self.goto.extend(array("i", [-1]) * len(self.non_terminals))
+        if self.built is not None:
+            self.built.append(0)
+        self.num_states += 1
+        return self.num_states - 1
+
+    def get_action(self, state: int, column: int) -> int:
+        return self.action[state * len(self.terminals) + column]
+
+    def set_action(self, state: int, column: int, code: int):
+        self.action[state * len(self.terminals) + column] = code
+
+    def get_goto(self, state: int, column: int) -> int:
+        return self.goto[state * len(self.non_terminals) + column]
+
+    def set_goto(self, state: int, column: int, target: int):
+        self.goto[state * len(self.non_terminals) + column] = target
+
+    def action_dict(self) -> dict[tuple[int, str], tuple[str, int | None]]:
+        """Returns the ACTION table as a {(state, terminal): action} dict."""
+        width = len(self.terminals)
+        return {
+            (index // width, self.terminals[index % width]): decode_action(code)
+            for index, code in enumerate(self.action)
+            if code
+        }
+
+    def compress(self) -> "CompressedTable":
+        return CompressedTable(self)
+
+
+def pack_rows(rows: list[dict[int, int]]) -> tuple[array, array, array]:
+    """Packs sparse rows into one array by first-fit row displacement (comb).
+
+    Returns (base, check, value): the cell (row, column) lives at
+    base[row] + column when check at that index equals row.
+    """
+    base = array("i", [0]) * len(rows)
+    check = array("i")
+    value = array("i")
+    occupied = bytearray()
+
+    # Placing the densest rows first keeps the packed array short
+    for row in sorted(range(len(rows)), key=lambda r: -len(rows[r])):
+        if not rows[row]:
+            continue
+        columns = sorted(rows[row])
+        first = columns[0]
+        offset = 0
+        while True:
+            # Jump straight to the next offset where the first column is free
+            slot = occupied.find(0, offset + first)
+            # Bases never go below zero, or lookups would wrap around
+            offset = max(offset, (len(occupied) if slot == -1 else slot) - first)
+            if all(
+                offset + column >= len(occupied) or not occupied[offset + column]
+                for column in columns
+            ):
+                break
+            offset += 1
+
+        needed = offset + columns[-1] + 1
+        if needed > len(occupied):
+            grow = needed - len(occupied)
+            occupied.extend(bytes(grow))
+            check.extend([-1] * grow)
+            value.extend([0] * grow)
+        for column in columns:
+            occupied[offset + column] = 1
+            check[offset + column] = row
+            value[offset + column] = rows[row][column]
+        base[row] = offset
+
+    return base, check, value
+
+
+class CompressedTable:
+    """Row-displacement compressed form of a CompiledTable.
+
+    Each state's most common reduction becomes its default action and is
+    dropped from the packed row, as is each non-terminal's most common
+    GOTO target. Like yacc, a default reduction may run before an error is
+    detected, but an erroneous token is never shifted.
+    """
+
+    def __init__(self, table: CompiledTable):
+        self.terminals = table.terminals
+        self.terminal_ids = table.terminal_ids
+        self.non_terminals = table.non_terminals
+        self.non_terminal_ids = table.non_terminal_ids
+        self.num_states = table.num_states
+        self.production_lhs = table.production_lhs
+        self.production_length = table.production_length
+
+        width = len(table.terminals)
+        self.default_action = array("i", [ERROR]) * table.num_states
+        action_rows: list[dict[int, int]] = []
+        for state in range(table.num_states):
+            row = table.action[state * width : (state + 1) * width]
+            reductions = Counter(code for code in row if code < ACCEPT)
+            default = reductions.most_common(1)[0][0] if reductions else ERROR
+            self.default_action[state] = default
+            action_rows.append(
+                {
+                    column: code
+                    for column, code in enumerate(row)
+                    if code and code != default
+                }
+            )
+        self.action_base, self.action_check, self.action_value = pack_rows(action_rows)
+
+        width = len(table.non_terminals)
+        self.default_goto = array("i", [-1]) * width
+        goto_rows: list[dict[int, int]] = [{} for _ in range(table.num_states)]
+        for column in range(width):
+            targets = Counter(
+                target for target in table.goto[column::width] if target != -1
+            )
+            if targets:
+                self.default_goto[column] = targets.most_common(1)[0][0]
+        for index, target in enumerate(table.goto):
+            state, column = divmod(index, width)
+            if target != -1 and target != self.default_goto[column]:
+                goto_rows[state][column] = target
+        self.goto_base, self.goto_check, self.goto_value = pack_rows(goto_rows)
+
+    def get_action(self, state: int, column: int) -> int:
+        index = self.action_base[state] + column
+        if index < len(self.action_check) and self.action_check[index] == state:
+            return self.action_value[index]
+        return self.default_action[state]
+
+    def get_goto(self, state: int, column: int) -> int:
+        index = self.goto_base[state] + column
+        if index < len(self.goto_check) and self.goto_check[index] == state:
+            return self.goto_value[index]
+        return self.default_goto[column]
+
+
+if __name__ == "__main__":
+    import random
+
+    # A row whose first column is past the end of the packed array used to
+    # get a negative base
+    base, check, value = pack_rows([{3: 7}])
+    assert base[0] >= 0 and check[base[0] + 3] == 0 and value[base[0] + 3] == 7
+
+    # Every filled cell must come back unchanged from the packed arrays
+    rng = random.Random(0)
+    for _ in range(500):
+        rows = [
+            {
+                column: rng.randint(1, 99)
+                for column in rng.sample(range(12), rng.randint(0, 6))
+            }
+            for _ in range(rng.randint(1, 30))
+        ]
+        base, check, value = pack_rows(rows)
+        assert all(offset >= 0 for offset in base)
+        for row, cells in enumerate(rows):
+            for column in range(12):
+                index = base[row] + column
+                found = index < len(check) and check[index] == row
+                assert found == (column in cells)
+                if found:
+                    assert value[index] == cells[column]
+
+    # A compressed table agrees with the dense one on every cell a parse
+    # reads: ACTION cells that aren't errors, and GOTO targets that exist.
+    # An error cell may read as the state's default reduction instead.
+    from src.cannonical_lr_parser import MODES, CanonicalLRParser
+
+    grammar = [
+        ("S", ["E"]),
+        ("E", ["E", "+", "T"]),
+        ("E", ["T"]),
+        ("T", ["T", "*", "F"]),
+        ("T", ["F"]),
+        ("F", ["(", "E", ")"]),
+        ("F", ["id"]),
+    ]
+    for mode in MODES:
+        table = CanonicalLRParser(grammar, mode).table
+        compressed = table.compress()
+        for state in range(table.num_states):
+            for column in range(len(table.terminals)):
+                code = table.get_action(state, column)
+                packed = compressed.get_action(state, column)
+                assert packed == code or (
+                    code == ERROR and packed == compressed.default_action[state]
+                )
+            for column in range(len(table.non_terminals)):
+                target = table.get_goto(state, column)
+                if target != -1:
+                    assert compressed.get_goto(state, column) == target
+
+    print("Packed tables round-trip")
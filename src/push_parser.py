@@ -0,0 +1,119 @@
+from collections.abc import Iterable
+
+from src.parse_driver import ParseResult
+from src.parsing_table import CompiledTable
+
+
+class PushParser:
+    """Runs the LR automaton on tokens as they arrive instead of on a list.
+
+    Only the state stack is kept, so memory grows with nesting depth rather
+    than input length. snapshot() returns that state as plain JSON data,
+    and restore() resumes from it, in another request or process, given
+    the same compiled table.
+    """
+
+    def __init__(self, table: CompiledTable):
+        self.table = table
+        self.stack = [0]
+        self.position = 0
+        self.steps = 0
+        self.error_position: int | None = None
+        self.accepted = False
+
+    def feed(self, token: str) -> bool:
+        """Consumes one token; returns False once the input can't be parsed."""
+        if self.error_position is not None or self.accepted:
+            return False
+        return self.advance(self.table.terminal_ids.get(token, -1))
+
+    def feed_many(self, tokens: Iterable[str]) -> bool:
+        for token in tokens:
+            if not self.feed(token):
+                return False
+        return True
+
+    def finish(self) -> ParseResult:
+        """Ends the input and returns the outcome, as parse_tokens would."""
+        if self.error_position is None and not self.accepted:
+            self.advance(self.table.terminal_ids["$"])
+        return ParseResult(self.accepted, self.error_position, self.steps)
+
+    def advance(self, column: int) -> bool:
+        # Reduces until the token is shifted (or accepted at the end marker)
+        table = self.table
+        width = len(table.terminals)
+        goto_width = len(table.non_terminals)
+        stack = self.stack
+        while True:
+            if table.built is not None and not table.built[stack[-1]]:
+                table.expand(stack[-1])
+            code = table.action[stack[-1] * width + column] if column >= 0 else 0
+            if code > 0:
+                self.steps += 1
+                stack.append(code - 1)
+                self.position += 1
+                return True
+            elif code < -1:
+                self.steps += 1
+                prod_index = -code - 1
+                length = table.production_length[prod_index]
+                if length:
+                    del stack[-length:]
+                lhs = table.production_lhs[prod_index]
+                stack.append(table.goto[stack[-1] * goto_width + lhs])
+            elif code == -1:
+                self.steps += 1
+                self.accepted = True
+                return True
+            else:
+                self.error_position = self.position
+                return False
+
+    def snapshot(self) -> dict:
+        return {
+            "stack": list(self.stack),
+            "position": self.position,
+            "steps": self.steps,
+            "error_position": self.error_position,
+            "accepted": self.accepted,
+        }
+
+    @classmethod
+    def restore(cls, table: CompiledTable, snapshot: dict) -> "PushParser":
+        """Rebuilds a parser from snapshot(); raises ValueError if it doesn't fit the table."""
+        try:
+            stack = snapshot["stack"]
+            position = snapshot["position"]
+            steps = snapshot["steps"]
+            error_position = snapshot["error_position"]
+            accepted = snapshot["accepted"]
+        except (KeyError, TypeError):
+            raise ValueError("Parser state is missing fields")
+        if (
+            not isinstance(stack, list)
+            or not stack
+            or stack[0] != 0
+            or any(
+                not isinstance(state, int) or not 0 <= state < table.num_states
+                for state in stack
+            )
+        ):
+            raise ValueError("Parser state has an invalid stack")
+        if any(
+            not isinstance(value, int) or value < 0
+            for value in (position, steps)
+            + (() if error_position is None else (error_position,))
+        ) or not isinstance(accepted, bool):
+            raise ValueError("Parser state has invalid counters")
+
+        parser = cls(table)
+        parser.stack = list(stack)
+        parser.position = position
+        parser.steps = steps
+        parser.error_position = error_position
+        parser.accepted = accepted
+        return parser
+
+    def copy(self) -> "PushParser":
+        return PushParser.restore(self.table, self.snapshot())
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Bump when a cached endpoint's output changes shape, so clients holding an
+# old ETag get the new body instead of a 304
+RESPONSE_VERSION = 1
+
+
+def response_tag(grammar_id: str, mode: str, endpoint: str, params: dict) -> str:
+    """Returns the ETag of an analysis response: a hash of everything it depends on."""
+    payload = json.dumps(
+        [RESPONSE_VERSION, grammar_id, mode, endpoint, params],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of serialized response bodies keyed by ETag.
+
+    Each entry keeps the body as rendered plus any compressed encodings of
+    it made so far, so a repeated request is neither reserialized nor
+    recompressed.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, tuple[str, dict[str, bytes]]] = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, tag: str, encoding: str = "identity") -> tuple[bytes, str] | None:
+        """Returns (body, mimetype) for a tag in the given encoding, if cached."""
+        with self.lock:
+            entry = self.entries.get(tag)
+            if entry is None or encoding not in entry[1]:
+                if encoding == "identity":
+                    self.misses += 1
+                return None
+            self.entries.move_to_end(tag)
+            if encoding == "identity":
+                self.hits += 1
+            return entry[1][encoding], entry[0]
+
+    def put(self, tag: str, body: bytes, mimetype: str, encoding: str = "identity"):
+        """Stores a body; other encodings are only kept alongside a cached identity body."""
+        with self.lock:
+            entry = self.entries.get(tag)
+            if entry is None:
+                if encoding != "identity":
+                    return
+                entry = (mimetype, {})
+                self.entries[tag] = entry
+            previous = entry[1].get(encoding)
+            if previous is not None:
+                self.total_bytes -= len(previous)
+            entry[1][encoding] = body
+            self.total_bytes += len(body)
+            self.entries.move_to_end(tag)
+            self._evict()
+
+    def _evict(self):
+        # Always keep the most recently stored body, even if it is oversized
+        while len(self.entries) > 1 and self.total_bytes > self.max_bytes:
+            _, (_, bodies) = self.entries.popitem(last=False)
+            self.total_bytes -= sum(len(body) for body in bodies.values())
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
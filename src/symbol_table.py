@@ -0,0 +1,52 @@
+class SymbolTable:
+    """Interns the productions and terminals of a grammar to integer ids.
+
+    Terminal ids double as bit positions, so a set of lookahead terminals is
+    stored as a single int bitset.
+    """
+
+    def __init__(self):
+        self.productions: list[tuple[str, tuple[str, ...]]] = []
+        self.production_ids: dict[tuple[str, tuple[str, ...]], int] = {}
+        self.terminals: list[str] = []
+        self.terminal_ids: dict[str, int] = {}
+        self._names_cache: dict[int, list[str]] = {}
+
+    def add_production(self, production: tuple[str, list[str]]) -> int:
+        """Appends a production and returns the id of its first occurrence."""
+        key = (production[0], tuple(production[1]))
+        self.productions.append(key)
+        return self.production_ids.setdefault(key, len(self.productions) - 1)
+
+    def intern_production(self, production: tuple[str, list[str]]) -> int:
+        key = (production[0], tuple(production[1]))
+        prod_id = self.production_ids.get(key)
+        if prod_id is None:
+            prod_id = self.add_production(key)
+        return prod_id
+
+    def intern_terminal(self, terminal: str) -> int:
+        terminal_id = self.terminal_ids.get(terminal)
+        if terminal_id is None:
+            terminal_id = len(self.terminals)
+            self.terminals.append(terminal)
+            self.terminal_ids[terminal] = terminal_id
+        return terminal_id
+
+    def terminal_bits(self, terminals) -> int:
+        bits = 0
+        for terminal in terminals:
+            bits |= 1 << self.intern_terminal(terminal)
+        return bits
+
+    def terminal_names(self, bits: int) -> list[str]:
+        names = self._names_cache.get(bits)
+        if names is None:
+            names = []
+            remaining = bits
+            while remaining:
+                lowest = remaining & -remaining
+                names.append(self.terminals[lowest.bit_length() - 1])
+                remaining ^= lowest
+            self._names_cache[bits] = names
+        return names
@@ -0,0 +1,93 @@
+from src.parsing_table import CompiledTable
+
+# Output formats for /parsing_tables: "dense" is one dict per state with a
+# key for every symbol, "sparse" only lists the cells that are filled in and
+# "comb" is the whole table packed by row displacement
+TABLE_FORMATS = ("dense", "sparse", "comb")
+
+# How codes are encoded in the sparse and comb formats
+ENCODING = {
+    "shift": "state + 1",
+    "reduce": "-(production + 1)",
+    "accept": -1,
+    "goto": "state",
+}
+
+
+def sparse_header(table: CompiledTable, state_count: int) -> dict:
+    """Describes the columns and cell encoding shared by every sparse row."""
+    non_terminals = [nt for nt in table.non_terminals if nt != "S'"]
+    return {
+        "format": "sparse",
+        "symbols": table.terminals + non_terminals,
+        "action_columns": len(table.terminals),
+        "state_count": state_count,
+        "encoding": ENCODING,
+    }
+
+
+def sparse_rows(table: CompiledTable, start: int, stop: int, dedup: bool = False):
+    """Yields each state's row as a flat [column, code, column, code, ...] list.
+
+    Columns index the header's symbols: the terminals take the ACTION
+    codes and the non-terminals after them take GOTO targets. With dedup,
+    a row equal to an earlier one in the same response is sent as that
+    state's number instead.
+    """
+    width = len(table.terminals)
+    goto_width = len(table.non_terminals)
+    # GOTO columns in header order, skipping the augmented start symbol
+    goto_columns = [
+        (table.non_terminal_ids[nt], width + i)
+        for i, nt in enumerate(nt for nt in table.non_terminals if nt != "S'")
+    ]
+    seen: dict[tuple[int, ...], int] = {}
+    for state in range(start, stop):
+        row = []
+        action = table.action[state * width : (state + 1) * width]
+        for column, code in enumerate(action):
+            if code:
+                row += (column, code)
+        goto = table.goto[state * goto_width : (state + 1) * goto_width]
+        for source, column in goto_columns:
+            if goto[source] != -1:
+                row += (column, goto[source])
+
+        if dedup:
+            key = tuple(row)
+            if key in seen:
+                yield seen[key]
+                continue
+            seen[key] = state
+        yield row
+
+
+def comb_table(table: CompiledTable) -> dict:
+    """Returns the row-displacement packed ACTION and GOTO tables.
+
+    Cell (state, column) is value[base[state] + column] when check at that
+    index equals state, and the state's default action (or the column's
+    default GOTO target) otherwise. A default reduction can stand in for
+    an error, so an error may be reported after some reductions, but an
+    erroneous token is never shifted.
+    """
+    compressed = table.compress()
+    return {
+        "format": "comb",
+        "terminals": table.terminals,
+        "non_terminals": table.non_terminals,
+        "state_count": table.num_states,
+        "encoding": {**ENCODING, "error": 0},
+        "action": {
+            "default": compressed.default_action.tolist(),
+            "base": compressed.action_base.tolist(),
+            "check": compressed.action_check.tolist(),
+            "value": compressed.action_value.tolist(),
+        },
+        "goto": {
+            "default": compressed.default_goto.tolist(),
+            "base": compressed.goto_base.tolist(),
+            "check": compressed.goto_check.tolist(),
+            "value": compressed.goto_value.tolist(),
+        },
+    }
@@ -0,0 +1,338 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from src.lr_item import LRItem
+from src.parsing_table import CompiledTable
+from src.symbol_table import SymbolTable
+
+# File layout: a fixed header, a JSON metadata block, then 8-byte aligned
+# sections of native int arrays (plus one of packed lookahead bitsets).
+# The metadata records each section's offset from the start of the data.
+MAGIC = b"PGTABLES"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sHHI")
+ALIGNMENT = 8
+
+# Where compiled parsers are kept unless PARSEGEN_TABLE_DIR says otherwise
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), "parsegen-tables")
+# How much of it they may take unless PARSEGEN_TABLE_MAX_BYTES says otherwise;
+# serverless instances share a small /tmp with everything else
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class StoredParser:
+    """A parser read back from a table store, or from a build worker's output.
+
+    Exposes the same attributes as CanonicalLRParser. The ACTION/GOTO arrays
+    are copied out of the buffer up front, while the canonical collection and
+    its transitions stay in it until something asks for them.
+    """
+
+    def __init__(self, metadata: dict, buffer: mmap.mmap | bytes, data_offset: int):
+        self.mode = metadata["mode"]
+        self.grammar = [(left, right) for left, right in metadata["grammar"]]
+        self.terminals = metadata["terminals"]
+        self.non_terminals = metadata["non_terminals"]
+        self.first_sets = {
+            symbol: set(names) for symbol, names in metadata["first_sets"].items()
+        }
+        self.follow_sets = {
+            symbol: set(names) for symbol, names in metadata["follow_sets"].items()
+        }
+        self.conflicts = metadata["conflicts"]
+        self.lexers: dict = {}
+        self.item_count = metadata["item_count"]
+        self.transition_count = metadata["transition_count"]
+        self.lookahead_width = metadata["lookahead_width"]
+        self.sections = metadata["sections"]
+        self.buffer = buffer
+        self.data_offset = data_offset
+
+        self.symbols = SymbolTable()
+        for terminal in self.terminals + ["$"]:
+            self.symbols.intern_terminal(terminal)
+        for prod in self.grammar:
+            self.symbols.add_production(prod)
+
+        num_states = metadata["num_states"]
+        self.table = CompiledTable.from_arrays(
+            self.terminals + ["$"],
+            self.non_terminals,
+            num_states,
+            self.read_array("action"),
+            self.read_array("goto"),
+            self.read_array("production_lhs"),
+            self.read_array("production_length"),
+        )
+        self._canonical_collection: list[set[LRItem]] | None = None
+        self._transitions: list[dict[str, int]] | None = None
+        self._goto_table: dict[tuple[int, str], int] | None = None
+        self._action_table: dict[tuple[int, str], tuple[str, int | None]] | None = None
+
+    def section(self, name: str) -> memoryview:
+        offset, length = self.sections[name]
+        start = self.data_offset + offset
+        return memoryview(self.buffer)[start : start + length]
+
+    def read_array(self, name: str) -> array:
+        values = array("i")
+        values.frombytes(self.section(name))
+        return values
+
+    @property
+    def canonical_collection(self) -> list[set[LRItem]]:
+        if self._canonical_collection is None:
+            offsets = self.read_array("state_offsets")
+            cores = self.read_array("item_cores")
+            lookaheads = self.section("item_lookaheads")
+            width = self.lookahead_width
+            collection = []
+            for state in range(len(offsets) - 1):
+                items = set()
+                for index in range(offsets[state], offsets[state + 1]):
+                    bits = int.from_bytes(
+                        lookaheads[index * width : (index + 1) * width], "little"
+                    )
+                    items.add(LRItem.from_core(self.symbols, cores[index], bits))
+                collection.append(items)
+            self._canonical_collection = collection
+        return self._canonical_collection
+
+    @property
+    def transitions(self) -> list[dict[str, int]]:
+        if self._transitions is None:
+            offsets = self.read_array("transition_offsets")
+            symbols = self.read_array("transition_symbols")
+            targets = self.read_array("transition_targets")
+            names = self.non_terminals + self.terminals
+            self._transitions = [
+                {
+                    names[symbols[index]]: targets[index]
+                    for index in range(offsets[state], offsets[state + 1])
+                }
+                for state in range(len(offsets) - 1)
+            ]
+        return self._transitions
+
+    @property
+    def goto_table(self) -> dict[tuple[int, str], int]:
+        if self._goto_table is None:
+            self._goto_table = {
+                (i, symbol): target
+                for i, row in enumerate(self.transitions)
+                for symbol, target in row.items()
+            }
+        return self._goto_table
+
+    @property
+    def action_table(self) -> dict[tuple[int, str], tuple[str, int | None]]:
+        if self._action_table is None:
+            self._action_table = self.table.action_dict()
+        return self._action_table
+
+
+def lookahead_width(parser) -> int:
+    return (len(parser.symbols.terminals) + 7) // 8
+
+
+def encode_sections(parser) -> dict[str, bytes]:
+    table = parser.table
+    width = lookahead_width(parser)
+
+    state_offsets = array("i", [0])
+    item_cores = array("i")
+    item_lookaheads = bytearray()
+    for state in parser.canonical_collection:
+        for item in state:
+            item_cores.append(item.core)
+            item_lookaheads.extend(item.lookahead_bits.to_bytes(width, "little"))
+        state_offsets.append(len(item_cores))
+
+    symbol_ids = {
+        symbol: i for i, symbol in enumerate(parser.non_terminals + parser.terminals)
+    }
+    transition_offsets = array("i", [0])
+    transition_symbols = array("i")
+    transition_targets = array("i")
+    for row in parser.transitions:
+        for symbol, target in row.items():
+            transition_symbols.append(symbol_ids[symbol])
+            transition_targets.append(target)
+        transition_offsets.append(len(transition_targets))
+
+    return {
+        "action": table.action.tobytes(),
+        "goto": table.goto.tobytes(),
+        "production_lhs": table.production_lhs.tobytes(),
+        "production_length": table.production_length.tobytes(),
+        "state_offsets": state_offsets.tobytes(),
+        "item_cores": item_cores.tobytes(),
+        "item_lookaheads": bytes(item_lookaheads),
+        "transition_offsets": transition_offsets.tobytes(),
+        "transition_symbols": transition_symbols.tobytes(),
+        "transition_targets": transition_targets.tobytes(),
+    }
+
+
+def encode_parser(parser, mode: str) -> bytes:
+    """Serializes a built parser in the table file format."""
+    sections = encode_sections(parser)
+    layout = {}
+    data = bytearray()
+    for name, payload in sections.items():
+        data.extend(bytes(aligned(len(data)) - len(data)))
+        layout[name] = (len(data), len(payload))
+        data.extend(payload)
+
+    metadata = json.dumps(
+        {
+            "mode": mode,
+            "byteorder": sys.byteorder,
+            "grammar": parser.grammar,
+            "terminals": parser.terminals,
+            "non_terminals": parser.non_terminals,
+            "first_sets": {
+                symbol: sorted(names) for symbol, names in parser.first_sets.items()
+            },
+            "follow_sets": {
+                symbol: sorted(names) for symbol, names in parser.follow_sets.items()
+            },
+            "conflicts": parser.conflicts,
+            "num_states": parser.table.num_states,
+            "item_count": sum(len(state) for state in parser.canonical_collection),
+            "transition_count": sum(len(row) for row in parser.transitions),
+            "lookahead_width": lookahead_width(parser),
+            "sections": layout,
+            "data_length": len(data),
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(metadata))
+    padding = bytes(aligned(len(header) + len(metadata)) - len(header) - len(metadata))
+    return header + metadata + padding + data
+
+
+def decode_parser(buffer, mode: str) -> StoredParser | None:
+    """Reads a parser back from encode_parser() output, or None if it isn't valid."""
+    try:
+        magic, version, _, metadata_length = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+        metadata = json.loads(
+            bytes(buffer[HEADER.size : HEADER.size + metadata_length]).decode("utf-8")
+        )
+        if metadata["byteorder"] != sys.byteorder or metadata["mode"] != mode:
+            return None
+        data_offset = aligned(HEADER.size + metadata_length)
+        if data_offset + metadata["data_length"] > len(buffer):
+            return None
+        return StoredParser(metadata, buffer, data_offset)
+    except (struct.error, ValueError, KeyError, TypeError):
+        return None
+
+
+class TableStore:
+    """Persists built parsers to a directory, one file per grammar and mode.
+
+    Files are written to a temporary name and renamed into place, so readers
+    never see a partial file. A file that is missing, truncated or written by
+    another format version reads as a miss and the parser is rebuilt.
+
+    The directory is kept under max_bytes: loading a file marks it as used,
+    and each write deletes the least recently used files until the rest fit.
+    """
+
+    def __init__(
+        self, directory: str = DEFAULT_DIRECTORY, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+
+    @classmethod
+    def from_environment(cls) -> "TableStore | None":
+        """Returns a store for PARSEGEN_TABLE_DIR, or None if it is set empty."""
+        directory = os.environ.get("PARSEGEN_TABLE_DIR", DEFAULT_DIRECTORY)
+        if not directory:
+            return None
+        max_bytes = os.environ.get("PARSEGEN_TABLE_MAX_BYTES")
+        return cls(directory, int(max_bytes) if max_bytes else DEFAULT_MAX_BYTES)
+
+    def path(self, grammar_id: str, mode: str) -> str:
+        return os.path.join(self.directory, f"{grammar_id}-{mode}.lrt")
+
+    def load(self, grammar_id: str, mode: str) -> StoredParser | None:
+        path = self.path(grammar_id, mode)
+        try:
+            with open(path, "rb") as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            # The modification time doubles as the last use, for pruning
+            os.utime(path)
+        except OSError:
+            pass
+        return decode_parser(buffer, mode)
+
+    def save(self, grammar_id: str, mode: str, parser) -> bool:
+        """Writes a parser's tables; returns False if the directory isn't writable."""
+        return self.write(grammar_id, mode, encode_parser(parser, mode))
+
+    def write(self, grammar_id: str, mode: str, data: bytes) -> bool:
+        """Writes already encoded tables, e.g. ones built in another process."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(descriptor, "wb") as file:
+                    file.write(data)
+                os.replace(temporary, self.path(grammar_id, mode))
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        except OSError:
+            return False
+        self.prune(keep=self.path(grammar_id, mode))
+        return True
+
+    def prune(self, keep: str | None = None):
+        """Deletes the least recently used files until the rest fit in max_bytes."""
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".lrt"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        # Pruned by another process in the meantime
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                # Parsers already mapped from the file keep working
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1